@@ -0,0 +1,59 @@
+"""
+Benchmarks for the countries data. Each import benchmark runs a fresh interpreter, since
+the cost being measured is only paid once per process.
+
+    python -m benchmarks.countries [--update-baseline]
+"""
+
+import subprocess
+import sys
+from functools import partial
+
+from emergency_alerts_utils.countries import data, get_countries, make_countries
+from emergency_alerts_utils.countries.fuzzy import FuzzyIndex
+
+from .utils import Benchmark, main
+
+# Importing `emergency_alerts_utils` on its own, so that its cost can be subtracted
+EMPTY_IMPORT = "import emergency_alerts_utils"
+IMPORT = "from emergency_alerts_utils.countries import Country"
+IMPORT_AND_LOOK_UP = "from emergency_alerts_utils.countries import Country; Country('France')"
+IMPORT_FROM_SOURCE_AND_LOOK_UP = (
+    "from emergency_alerts_utils.countries import Country, data; "
+    "data.load_artefact = lambda: None; "
+    "Country('France')"
+)
+
+
+def run_python(code):
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def fuzzy_search(names):
+    countries = get_countries()
+    for name in names:
+        countries.fuzzy_search(name)
+
+
+def look_up(names):
+    countries = get_countries()
+    for name in names:
+        countries[name]
+
+
+BENCHMARKS = [
+    Benchmark("interpreter_and_package", partial(run_python, EMPTY_IMPORT)),
+    Benchmark("import", partial(run_python, IMPORT)),
+    Benchmark("import_and_look_up", partial(run_python, IMPORT_AND_LOOK_UP)),
+    Benchmark("import_from_source_and_look_up", partial(run_python, IMPORT_FROM_SOURCE_AND_LOOK_UP)),
+    Benchmark("load_artefact", data.load_artefact),
+    Benchmark("load_from_source", lambda: make_countries(data.load_from_source())),
+    Benchmark("look_up", partial(look_up, ["France", "the gambia", "Gambia", "UK", "Yr Alban", "Qatar"] * 100)),
+    Benchmark("fuzzy_search", partial(fuzzy_search, ["Frnace", "Gamiba", "Untied Kingdom", "Braizl", "Qumran"])),
+    Benchmark("fuzzy_search.short", partial(fuzzy_search, ["uk", "Itlay", "Jaman"])),
+    Benchmark("build_fuzzy_index", lambda: FuzzyIndex(get_countries()._index)),
+]
+
+
+if __name__ == "__main__":
+    main("countries", BENCHMARKS, iterations=20)
@@ -0,0 +1,62 @@
+"""
+Benchmarks for `InsensitiveDict` with spreadsheet-sized workloads, where every row of a
+file becomes a dictionary keyed by the file’s column headings.
+
+    python -m benchmarks.insensitive_dict [--update-baseline]
+"""
+
+from functools import partial
+
+from emergency_alerts_utils.insensitive_dict import InsensitiveDict
+
+from .utils import Benchmark, main
+
+ROWS = 1_000
+
+
+def make_rows(column_count):
+    headings = ["Phone number"] + [f"Column_{i} Name" for i in range(column_count - 1)]
+    return headings, [{heading: f"{heading} {row}" for heading in headings} for row in range(ROWS)]
+
+
+def build(rows):
+    for row in rows:
+        InsensitiveDict(row)
+
+
+def look_up_every_column(dicts, lookups):
+    for row in dicts:
+        for key in lookups:
+            row.get(key)
+            row[key]
+
+
+def get_keys(dicts):
+    for row in dicts:
+        row.keys()
+
+
+def as_dict_with_keys(dicts, lookups):
+    for row in dicts:
+        row.as_dict_with_keys(lookups)
+
+
+def _benchmarks(column_count):
+    headings, rows = make_rows(column_count)
+    dicts = [InsensitiveDict(row) for row in rows]
+    # Look up with differently formatted keys, as placeholders in a template would be
+    lookups = [heading.upper().replace(" ", "_") for heading in headings]
+
+    return [
+        Benchmark(f"build.{column_count}_columns", partial(build, rows)),
+        Benchmark(f"lookup.{column_count}_columns", partial(look_up_every_column, dicts, lookups)),
+        Benchmark(f"keys.{column_count}_columns", partial(get_keys, dicts)),
+        Benchmark(f"as_dict_with_keys.{column_count}_columns", partial(as_dict_with_keys, dicts, lookups)),
+    ]
+
+
+BENCHMARKS = _benchmarks(10) + _benchmarks(50)
+
+
+if __name__ == "__main__":
+    main("insensitive_dict", BENCHMARKS, iterations=20)
@@ -0,0 +1,121 @@
+"""
+Benchmarks for rendering each `Template` subclass, and each formatter stage used while
+rendering, over a corpus of realistic messages.
+
+    python -m benchmarks.templates [--update-baseline] [--filter sms_preview]
+"""
+
+from functools import partial
+
+from emergency_alerts_utils import MAX_BROADCAST_CHAR_COUNT
+from emergency_alerts_utils.field import Field
+from emergency_alerts_utils.formatters import (
+    add_prefix,
+    autolink_urls,
+    escape_html,
+    nl2br,
+    normalise_multiple_newlines,
+    normalise_whitespace_and_newlines,
+    remove_whitespace_before_punctuation,
+    sms_encode,
+)
+from emergency_alerts_utils.template import (
+    BroadcastMessageTemplate,
+    BroadcastPreviewTemplate,
+    SMSMessageTemplate,
+    SMSPreviewTemplate,
+)
+
+from .utils import Benchmark, main
+
+_FLOOD_WARNING = (
+    "Severe flood warning for the River Severn at Shrewsbury. Water levels are rising quickly "
+    "and flooding of homes and businesses is expected. Move to higher ground if it is safe to do so. "
+    "Do not walk or drive through flood water.\n\n"
+    "Find out more at gov.uk/alerts or call Floodline on 0345 988 1188."
+)
+
+_WELSH = (
+    "Rhybudd llifogydd difrifol ar gyfer Afon Hafren yn Amwythig. Mae lefelau’r dŵr yn codi’n gyflym. "
+    "Ewch i dir uwch os yw’n ddiogel i chi wneud hynny. Peidiwch â cherdded na gyrru trwy ddŵr llifogydd. "
+    "Mae’r ŵyl wedi’i chanslo – gweler llyw.cymru/rhybuddion am ragor o wybodaeth."
+)
+
+CORPUS = {
+    "plain": (_FLOOD_WARNING, None),
+    "welsh": (_WELSH, None),
+    "emoji": ("⚠️ Storm warning 🌪️ – stay indoors 🏠 and keep away from windows. Updates: gov.uk/alerts 📱", None),
+    "urls": (
+        "See gov.uk/alerts, www.met-office.gov.uk/weather/warnings-and-advice (updated hourly), "
+        "https://check-for-flooding.service.gov.uk/alerts-and-warnings?search=Shrewsbury#map and "
+        "example.com/foo_(bar)).",
+        None,
+    ),
+    "placeholders": (
+        " ".join(f"((field {i}))" for i in range(30)),
+        {f"field {i}": f"value {i}" for i in range(30)},
+    ),
+    "conditionals": (
+        "Dear ((name)), ((flooded??Your property is in a flood zone. ))((evacuate??Please leave now. ))"
+        "Meet at ((location)). ((pets??Pets are welcome at the rest centre.))",
+        {"name": "Sam", "flooded": "yes", "evacuate": "no", "location": "the town hall", "pets": "yes"},
+    ),
+    "at_limit": (((_FLOOD_WARNING + "\n\n") * 10)[:MAX_BROADCAST_CHAR_COUNT], None),
+}
+
+TEMPLATE_CLASSES = {
+    "sms_message": (SMSMessageTemplate, "sms"),
+    "sms_preview": (SMSPreviewTemplate, "sms"),
+    "broadcast_preview": (BroadcastPreviewTemplate, "broadcast"),
+    "broadcast_message": (BroadcastMessageTemplate, "broadcast"),
+}
+
+
+def render(template_class, template_type, content, values):
+    return str(template_class({"content": content, "template_type": template_type}, values))
+
+
+def fill_in_fields(corpus):
+    for content, values in corpus.values():
+        str(Field(content, values, html="escape"))
+
+
+# Each stage is timed against the corpus with placeholders already filled in, so that only
+# the stage itself is measured
+STAGES = {
+    "escape_html": escape_html,
+    "add_prefix": partial(add_prefix, prefix="Environment Agency"),
+    "sms_encode": sms_encode,
+    "remove_whitespace_before_punctuation": remove_whitespace_before_punctuation,
+    "normalise_whitespace_and_newlines": normalise_whitespace_and_newlines,
+    "normalise_multiple_newlines": normalise_multiple_newlines,
+    "nl2br": nl2br,
+    "autolink_urls": autolink_urls,
+}
+
+FILLED_IN_CORPUS = [str(Field(content, values, html="passthrough")) for content, values in CORPUS.values()]
+
+
+def run_stage(stage):
+    for text in FILLED_IN_CORPUS:
+        stage(text)
+
+
+BENCHMARKS = (
+    [
+        Benchmark(
+            f"{template_name}.{message_name}",
+            partial(render, template_class, template_type, content, values),
+        )
+        for template_name, (template_class, template_type) in TEMPLATE_CLASSES.items()
+        for message_name, (content, values) in CORPUS.items()
+    ]
+    + [
+        Benchmark("stage.field", partial(fill_in_fields, CORPUS)),
+    ]
+    + [Benchmark(f"stage.{stage_name}", partial(run_stage, stage)) for stage_name, stage in STAGES.items()]
+)
+
+
+if __name__ == "__main__":
+    main("templates", BENCHMARKS)
@@ -0,0 +1,146 @@
+"""
+Shared harness for the benchmark suites in this directory.
+
+Each suite is a module with a list of `Benchmark`s and calls `main` with them. Results are
+compared against a baseline stored in `benchmarks/baselines/<suite>.json`, which can be
+regenerated with `--update-baseline` after an intentional change in performance.
+
+Baselines are only meaningful on the machine they were recorded on, so compare like with
+like, for example by recording a fresh baseline on `main` before running against a branch.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+BASELINES_DIRECTORY = os.path.join(os.path.dirname(__file__), "baselines")
+
+DEFAULT_TOLERANCE = 0.25
+
+# `max_iterations` caps how many times a slow benchmark is run, whatever the suite asks for
+Benchmark = namedtuple("Benchmark", ["name", "func", "max_iterations"], defaults=[None])
+
+
+def measure(func, *, iterations, warmup=None):
+    """
+    Calls `func` `iterations` times, timing each call separately, then once more with
+    tracemalloc running to find the peak memory allocated during a single call.
+    """
+    for _ in range(warmup if warmup is not None else max(iterations // 10, 1)):
+        func()
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            func()
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "calls_per_second": round(len(timings) / (sum(timings) / 1e9), 1),
+        "p99_microseconds": round(timings[int(len(timings) * 0.99) - 1] / 1e3, 1),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Returns a description of every result which is slower, or uses more memory, than its
+    baseline by more than `tolerance` (a fraction, so 0.25 means 25%).
+    """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result["calls_per_second"] < expected["calls_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['calls_per_second']} calls/s, baseline {expected['calls_per_second']}")
+        if result["p99_microseconds"] > expected["p99_microseconds"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {result['p99_microseconds']}µs, baseline {expected['p99_microseconds']}")
+        if result["peak_memory_kib"] > expected["peak_memory_kib"] * (1 + tolerance):
+            regressions.append(f"{name}: peak {result['peak_memory_kib']}KiB, baseline {expected['peak_memory_kib']}")
+
+    return regressions
+
+
+def baseline_path(suite):
+    return os.path.join(BASELINES_DIRECTORY, f"{suite}.json")
+
+
+def load_baseline(suite):
+    try:
+        with open(baseline_path(suite)) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(suite, results):
+    with open(baseline_path(suite), "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+def print_results(results, baseline):
+    name_width = max(len(name) for name in results)
+    print(f"{'benchmark'.ljust(name_width)}  {'calls/s':>12}  {'vs baseline':>11}  {'p99 µs':>10}  {'peak KiB':>9}")
+    for name, result in results.items():
+        if name in baseline:
+            change = f"{result['calls_per_second'] / baseline[name]['calls_per_second'] - 1:+.0%}"
+        else:
+            change = "new"
+        print(
+            f"{name.ljust(name_width)}  {result['calls_per_second']:>12,.1f}  {change:>11}  "
+            f"{result['p99_microseconds']:>10,.1f}  {result['peak_memory_kib']:>9,.1f}"
+        )
+
+
+def main(suite, benchmarks, *, iterations=1000):
+    parser = argparse.ArgumentParser(description=f"Run the {suite} benchmarks")
+    parser.add_argument("--iterations", type=int, default=iterations)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        benchmark.name: measure(
+            benchmark.func, iterations=min(args.iterations, benchmark.max_iterations or args.iterations)
+        )
+        for benchmark in benchmarks
+        if args.filter in benchmark.name
+    }
+    baseline = load_baseline(suite)
+
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        save_baseline(suite, {**baseline, **results})
+        print(f"\nBaseline saved to {baseline_path(suite)}")
+        return
+
+    if regressions := find_regressions(results, baseline, args.tolerance):
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} tolerance:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
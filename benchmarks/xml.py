@@ -0,0 +1,440 @@
+"""
+Benchmarks for generating the CAP and IBAG XML sent to the mobile network operators. One
+alert is fanned out to every operator, each of which takes one of the two formats.
+
+Signing and verifying use RSA keys, a self-signed certificate and a CA generated when the
+suite starts, so no real key material is needed to run them.
+
+Every benchmark generates, signs or reads one message per call, so calls/s is messages/s,
+except `fan_out.*`, which handle one message for each of the four operators in a call.
+Alerts are generated with a range of area sizes, named `.areas_<polygons>x<points>`.
+
+    python -m benchmarks.xml [--update-baseline]
+"""
+
+import datetime
+import io
+import logging
+import math
+import os
+import tempfile
+from copy import deepcopy
+from functools import partial
+
+import certifi
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from signxml import XMLVerifier
+
+from emergency_alerts_utils.logging import JsonFormatterForCloudWatch
+from emergency_alerts_utils.xml.broadcast import (
+    generate_xml_bodies,
+    generate_xml_body,
+    write_xml_body,
+)
+from emergency_alerts_utils.xml.cap import (
+    generate_cap_alert,
+    generate_cap_cancel_message,
+    generate_cap_link_test,
+)
+from emergency_alerts_utils.xml.common import (
+    DocumentSigner,
+    DocumentVerifier,
+    convert_etree_to_string,
+    digitally_sign,
+)
+from emergency_alerts_utils.xml.ibag import (
+    format_ibag_signature,
+    generate_ibag_alert,
+    generate_ibag_cancel_message,
+    generate_ibag_link_test,
+)
+from emergency_alerts_utils.xml.parser import iterparse_xml_body, parse_xml_body
+
+from .utils import Benchmark, main
+
+# One operator for each combination of format and channel we'd expect to see
+MESSAGE_FORMATS = ["cap", "ibag", "cap", "ibag"]
+
+POLYGON = [
+    [51.12, -1.2],
+    [51.12, 1.2],
+    [51.74, 1.2],
+    [51.74, -1.2],
+    [51.12, -1.2],
+]
+
+
+def make_polygon(point_count):
+    """
+    Returns a circle of `point_count` points, plus the first again to close it, rounded to
+    the 5 decimal places a real polygon would have
+    """
+    return [
+        [round(51 + math.sin(2 * math.pi * i / point_count), 5), round(-1 + math.cos(2 * math.pi * i / point_count), 5)]
+        for i in range(point_count)
+    ] + [[51.0, 0.0]]
+
+
+# Roughly the detail of a polygon drawn around a real coastline
+DETAILED_POLYGON = [[round(51 + math.sin(i / 80), 5), round(-1 + math.cos(i / 80), 5)] for i in range(500)] + [
+    [51.0, 0.0]
+]
+
+# The number of polygons, each in its own area, and points in each, from a small alert to the
+# most detailed we'd expect to send
+AREA_SIZES = [(1, 100), (10, 500), (50, 500), (50, 2000)]
+
+
+def make_event(message_format, message_type="alert", polygon_count=1, polygon=POLYGON):
+    event = {
+        "identifier": "0a0b0c0d-0000-4000-8000-000000000000",
+        "message_type": message_type,
+        "message_format": message_format,
+        "message_number": "00000074",
+        "sent": "2020-01-01T00:00:00-00:00",
+    }
+    if message_type == "alert":
+        event |= {
+            "headline": "GOV.UK Emergency Alert",
+            "description": "Severe flooding is expected in your area. Move to higher ground now. " * 4,
+            "language": "English",
+            "areas": [{"polygon": polygon} for _ in range(polygon_count)],
+            "expires": "2020-01-01T01:00:00-00:00",
+            "channel": "severe",
+        }
+    if message_type == "cancel":
+        event["references"] = [{"message_id": "previous", "message_number": "00000073", "sent": event["sent"]}]
+    return event
+
+
+def make_key_and_certificate(common_name, issuer_key=None, issuer=None, ca=False):
+    """
+    Returns a new 2048 bit RSA key and a certificate for it, signed by `issuer_key` for the
+    certificate `issuer`, or self-signed
+    """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer.subject if issuer else name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        # Verifying a chain needs the extensions a real CA would add
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=not ca,
+                content_commitment=False,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=ca,
+                crl_sign=ca,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key((issuer_key or key).public_key()), critical=False
+        )
+        .sign(issuer_key or key, hashes.SHA256())
+    )
+    return key, certificate
+
+
+def to_pem(key, certificate):
+    return (
+        key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode(),
+        certificate.public_bytes(serialization.Encoding.PEM).decode(),
+    )
+
+
+def make_ca_file(ca_certificate):
+    """
+    Returns the path of a file with the certificates signxml trusts by default and
+    `ca_certificate` in it, which is deleted when the suite exits
+    """
+    ca_file = tempfile.NamedTemporaryFile("w", suffix=".pem")
+    with open(certifi.where()) as bundle:
+        ca_file.write(bundle.read())
+    ca_file.write(ca_certificate.public_bytes(serialization.Encoding.PEM).decode())
+    ca_file.flush()
+    CA_FILES.append(ca_file)
+    return ca_file.name
+
+
+CA_FILES = []
+
+SIGNING_KEY, SIGNING_CERTIFICATE = to_pem(*make_key_and_certificate("benchmarks.example"))
+
+CA_KEY, CA_CERTIFICATE = make_key_and_certificate("ca.benchmarks.example", ca=True)
+CA_FILE = make_ca_file(CA_CERTIFICATE)
+CA_SIGNED_KEY, CA_SIGNED_CERTIFICATE = to_pem(
+    *make_key_and_certificate("signer.benchmarks.example", CA_KEY, CA_CERTIFICATE)
+)
+
+
+def fan_out(events, **kwargs):
+    for event in events:
+        generate_xml_body(event, **kwargs)
+
+
+def stream(events, **kwargs):
+    for event in events:
+        write_xml_body(event, BODY_STREAM, **kwargs)
+
+
+def logged(func):
+    """
+    Calls `func` with the broadcast logger writing JSON at INFO, as it does in the apps
+    """
+    logger = logging.getLogger("broadcast")
+    handler = logging.StreamHandler(LOG_STREAM)
+    handler.setFormatter(JsonFormatterForCloudWatch())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        func()
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+
+
+LOG_STREAM = open(os.devnull, "w")
+BODY_STREAM = open(os.devnull, "wb")
+
+
+def iterparse(body):
+    iterparse_xml_body(io.BytesIO(body))
+
+
+def sign(event, signer=None):
+    xml = generate_cap_alert(
+        identifier=event["identifier"],
+        headline=event["headline"],
+        description=event["description"],
+        areas=event["areas"],
+        sent=event["sent"],
+        expires=event["expires"],
+        language=event["language"],
+        channel=event["channel"],
+    )
+    if signer is None:
+        digitally_sign(xml, key=SIGNING_KEY, cert=SIGNING_CERTIFICATE)
+    else:
+        signer(SIGNING_KEY, SIGNING_CERTIFICATE).sign(xml)
+
+
+def make_signed_body(key, certificate):
+    return generate_xml_body(
+        make_event("cap"), signing_enabled=True, signing_key=key, signing_certificate=certificate
+    ).encode("utf-8")
+
+
+def verify(body, verifier):
+    verifier.verify(body)
+
+
+def verify_without_cache(body, **kwargs):
+    # What verifying cost with a new `XMLVerifier`, which loads the certificates again, for
+    # every message
+    XMLVerifier().verify(body, **kwargs)
+
+
+def get_area_size_benchmarks():
+    benchmarks = []
+    for polygon_count, point_count in AREA_SIZES:
+        suffix = f"areas_{polygon_count}x{point_count}"
+        # Keep the slowest to a few seconds
+        max_iterations = max(200_000 // (polygon_count * point_count), 20)
+        cap_event = make_event("cap", polygon_count=polygon_count, polygon=make_polygon(point_count))
+        ibag_event = make_event("ibag", polygon_count=polygon_count, polygon=make_polygon(point_count))
+        cap_alert = generate(generate_cap_alert, cap_event)
+        benchmarks += [
+            Benchmark(f"generate_cap_alert.{suffix}", partial(generate, generate_cap_alert, cap_event), max_iterations),
+            Benchmark(
+                f"generate_ibag_alert.{suffix}", partial(generate, generate_ibag_alert, ibag_event), max_iterations
+            ),
+            Benchmark(f"convert_etree_to_string.{suffix}", partial(convert_etree_to_string, cap_alert), max_iterations),
+            Benchmark(
+                f"digitally_sign.{suffix}",
+                partial(digitally_sign, cap_alert, key=SIGNING_KEY, cert=SIGNING_CERTIFICATE),
+                max_iterations,
+            ),
+        ]
+    return benchmarks
+
+
+def format_signature(signed_ibag_alert):
+    # `format_ibag_signature` moves the signature, so can only be called once for each tree
+    format_ibag_signature(deepcopy(signed_ibag_alert))
+
+
+def generate(func, event):
+    return func(
+        **{
+            "identifier": event["identifier"],
+            "headline": event["headline"],
+            "description": event["description"],
+            "areas": event["areas"],
+            "sent": event["sent"],
+            "expires": event["expires"],
+            "language": event["language"],
+            "channel": event["channel"],
+        }
+        | ({"message_number": event["message_number"]} if func is generate_ibag_alert else {})
+    )
+
+
+CANCEL_EVENT = make_event("cap", "cancel")
+SENT = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+BENCHMARKS = [
+    Benchmark("fan_out.alert", partial(fan_out, [make_event(f) for f in MESSAGE_FORMATS])),
+    Benchmark("fan_out.cancel", partial(fan_out, [make_event(f, "cancel") for f in MESSAGE_FORMATS])),
+    Benchmark(
+        "fan_out.detailed_alert",
+        partial(fan_out, [make_event(f, polygon_count=50, polygon=DETAILED_POLYGON) for f in MESSAGE_FORMATS]),
+        max_iterations=200,
+    ),
+    Benchmark(
+        "fan_out.detailed_alert.streamed",
+        partial(stream, [make_event(f, polygon_count=50, polygon=DETAILED_POLYGON) for f in MESSAGE_FORMATS]),
+        max_iterations=200,
+    ),
+    Benchmark(
+        "fan_out.detailed_alert.logged",
+        partial(
+            logged,
+            partial(fan_out, [make_event(f, polygon_count=50, polygon=DETAILED_POLYGON) for f in MESSAGE_FORMATS]),
+        ),
+        max_iterations=200,
+    ),
+    Benchmark("fan_out.link_test", partial(fan_out, [make_event(f, "test") for f in MESSAGE_FORMATS])),
+    Benchmark(
+        "fan_out.signed_alert",
+        partial(
+            fan_out,
+            [make_event(f) for f in MESSAGE_FORMATS],
+            signing_enabled=True,
+            signing_key=SIGNING_KEY,
+            signing_certificate=SIGNING_CERTIFICATE,
+        ),
+        max_iterations=500,
+    ),
+    Benchmark(
+        "fan_out.signed_alert.batch",
+        partial(
+            generate_xml_bodies,
+            make_event("cap"),
+            [
+                {
+                    "message_format": message_format,
+                    "signing_key": SIGNING_KEY,
+                    "signing_certificate": SIGNING_CERTIFICATE,
+                }
+                for message_format in MESSAGE_FORMATS
+            ],
+        ),
+        max_iterations=500,
+    ),
+    Benchmark("generate_cap_alert", partial(generate, generate_cap_alert, make_event("cap"))),
+    Benchmark("generate_ibag_alert", partial(generate, generate_ibag_alert, make_event("ibag"))),
+    *get_area_size_benchmarks(),
+    Benchmark(
+        "generate_cap_cancel_message",
+        partial(
+            generate_cap_cancel_message,
+            identifier=CANCEL_EVENT["identifier"],
+            sent=CANCEL_EVENT["sent"],
+            references=CANCEL_EVENT["references"],
+        ),
+    ),
+    Benchmark(
+        "generate_ibag_cancel_message",
+        partial(
+            generate_ibag_cancel_message,
+            message_number=CANCEL_EVENT["message_number"],
+            identifier=CANCEL_EVENT["identifier"],
+            references=CANCEL_EVENT["references"],
+            sent=CANCEL_EVENT["sent"],
+        ),
+    ),
+    Benchmark(
+        "generate_cap_link_test", partial(generate_cap_link_test, identifier=CANCEL_EVENT["identifier"], sent=SENT)
+    ),
+    Benchmark(
+        "generate_ibag_link_test",
+        partial(
+            generate_ibag_link_test,
+            message_number=CANCEL_EVENT["message_number"],
+            identifier=CANCEL_EVENT["identifier"],
+            sent=SENT,
+        ),
+    ),
+    Benchmark(
+        "format_ibag_signature",
+        partial(
+            format_signature,
+            digitally_sign(
+                generate(generate_ibag_alert, make_event("ibag")), key=SIGNING_KEY, cert=SIGNING_CERTIFICATE
+            ),
+        ),
+    ),
+    Benchmark("parse.alert", partial(parse_xml_body, generate_xml_body(make_event("cap")))),
+    Benchmark(
+        "parse.detailed_alert",
+        partial(parse_xml_body, generate_xml_body(make_event("cap", polygon_count=50, polygon=DETAILED_POLYGON))),
+        max_iterations=200,
+    ),
+    Benchmark(
+        "iterparse.detailed_alert",
+        partial(
+            iterparse,
+            generate_xml_body(make_event("cap", polygon_count=50, polygon=DETAILED_POLYGON)).encode("utf-8"),
+        ),
+        max_iterations=200,
+    ),
+    Benchmark("sign.cached_signer", partial(sign, make_event("cap")), max_iterations=500),
+    # What signing cost when the key was loaded for every message
+    Benchmark("sign.new_signer", partial(sign, make_event("cap"), signer=DocumentSigner), max_iterations=100),
+    Benchmark(
+        "verify.pinned_certificate",
+        partial(verify, make_signed_body(SIGNING_KEY, SIGNING_CERTIFICATE), DocumentVerifier(SIGNING_CERTIFICATE)),
+        max_iterations=500,
+    ),
+    Benchmark(
+        "verify.pinned_certificate.uncached",
+        partial(
+            verify_without_cache, make_signed_body(SIGNING_KEY, SIGNING_CERTIFICATE), x509_cert=SIGNING_CERTIFICATE
+        ),
+        max_iterations=500,
+    ),
+    Benchmark(
+        "verify.ca_chain",
+        partial(verify, make_signed_body(CA_SIGNED_KEY, CA_SIGNED_CERTIFICATE), DocumentVerifier(ca_pem_file=CA_FILE)),
+        max_iterations=500,
+    ),
+    Benchmark(
+        "verify.ca_chain.uncached",
+        partial(verify_without_cache, make_signed_body(CA_SIGNED_KEY, CA_SIGNED_CERTIFICATE), ca_pem_file=CA_FILE),
+        max_iterations=200,
+    ),
+]
+
+
+if __name__ == "__main__":
+    main("xml", BENCHMARKS, iterations=2000)
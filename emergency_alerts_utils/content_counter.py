@@ -0,0 +1,269 @@
+import re
+from bisect import bisect_right
+from collections import Counter, namedtuple
+
+from emergency_alerts_utils import MAGIC_SEQUENCE
+from emergency_alerts_utils.field import Field
+from emergency_alerts_utils.formatters import (
+    normalise_whitespace,
+    remove_whitespace_before_punctuation,
+)
+from emergency_alerts_utils.sanitise_text import SanitiseSMS
+from emergency_alerts_utils.template import (
+    BaseBroadcastTemplate,
+    BroadcastMessageTemplate,
+)
+
+# Everything `str.splitlines` splits on, apart from `\r` which can be followed by `\n`
+LINE_ENDINGS = "\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+LineStats = namedtuple(
+    "LineStats",
+    [
+        "length",
+        "extended_gsm_count",
+        "is_empty",
+        "has_unclosed_placeholder",
+        "ends_with_carriage_return",
+        "is_only_conditionals_before_newline",
+    ],
+)
+
+# A placeholder can only span more than one line if a line ends part way through one
+unclosed_placeholder = re.compile(r"\(\([^()]*\Z")
+
+_extended_gsm_counts = {}
+
+
+def _count_extended_gsm_chars_after_encoding(character):
+    if character not in _extended_gsm_counts:
+        _extended_gsm_counts[character] = sum(
+            encoded in SanitiseSMS.EXTENDED_GSM_CHARACTERS for encoded in SanitiseSMS.encode_char(character)
+        )
+    return _extended_gsm_counts[character]
+
+
+def _replace_placeholder(match):
+    # Without personalisation, conditional placeholders render as nothing and other
+    # placeholders as the magic sequence, which is removed after whitespace is normalised
+    return "" if "??" in match.group(1) else MAGIC_SEQUENCE
+
+
+def get_line_stats(line):
+    text = line.splitlines()[0] if line else ""
+    line_ending = line[len(text) :]
+    has_unclosed_placeholder = bool(unclosed_placeholder.search(text))
+    text = Field.placeholder_pattern.sub(_replace_placeholder, text)
+    is_only_conditionals_before_newline = not text and line_ending == "\n"
+    text = normalise_whitespace(remove_whitespace_before_punctuation(text))
+    is_empty = not text
+    text = text.replace(MAGIC_SEQUENCE, "")
+    return LineStats(
+        length=len(text),
+        extended_gsm_count=sum(map(_count_extended_gsm_chars_after_encoding, text)),
+        is_empty=is_empty,
+        has_unclosed_placeholder=has_unclosed_placeholder,
+        ends_with_carriage_return=line_ending == "\r",
+        is_only_conditionals_before_newline=is_only_conditionals_before_newline,
+    )
+
+
+class BroadcastContentCounter:
+    """
+    Keeps track of the counts that `BroadcastMessageTemplate.from_content(content)` would
+    give for `content_count`, `encoded_content_count` and `content_too_long`, for an editor
+    where the content changes a keystroke at a time.
+
+    Edits are applied with `apply_edit(offset, deleted, inserted)`, which removes `deleted`
+    characters starting at `offset` then inserts the `inserted` string there. Only the lines
+    around the edit are normalised again, and running totals are kept for the rest.
+
+    Whitespace is normalised one line at a time, which gives the same result as normalising
+    the whole message unless placeholders change where the lines break: either by spanning
+    more than one line, or by removing everything between a carriage return and a newline.
+    The counter falls back to the template while the content has either of those.
+    """
+
+    MAX_CONTENT_COUNT_GSM = BaseBroadcastTemplate.MAX_CONTENT_COUNT_GSM
+    MAX_CONTENT_COUNT_UCS2 = BaseBroadcastTemplate.MAX_CONTENT_COUNT_UCS2
+
+    def __init__(self, content=""):
+        self._lines = []
+        self._line_stats = []
+        self._content = ""
+        self._content_length = 0
+        # Where each line starts. Lines after `_step_line` haven't had `_step_length` added
+        # yet, because moving every line after an edit would cost as much as the content is
+        # long. Edits in an editor are usually close to the last one, so only the lines
+        # between them need updating.
+        self._line_starts = []
+        self._step_line = -1
+        self._step_length = 0
+        self._length = 0
+        self._extended_gsm_count = 0
+        self._non_empty_line_count = 0
+        self._non_empty_lines_after_empty_line_count = 0
+        self._unclosed_placeholder_count = 0
+        self._joined_line_endings_count = 0
+        self._welsh_non_gsm_characters = Counter()
+        self.apply_edit(0, 0, content)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}("{self.content}")'
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = "".join(self._lines)
+        return self._content
+
+    def apply_edit(self, offset, deleted, inserted):
+        if not 0 <= offset <= offset + deleted <= self._content_length:
+            raise ValueError(f"Edit at {offset} deleting {deleted} characters is outside the content")
+
+        first_line, last_line = self._get_lines_around(offset, offset + deleted)
+        region_start = self._get_line_start(first_line)
+        region = "".join(self._lines[first_line:last_line])
+        start, end = offset - region_start, offset + deleted - region_start
+        self._update_welsh_non_gsm_characters(region[start:end], inserted)
+        region = region[:start] + inserted + region[end:]
+
+        new_lines = region.splitlines(keepends=True)
+
+        # If the edit leaves the last line without a line ending, or with a carriage return
+        # which could pair with a newline at the start of the next line, the next line has
+        # to be included too
+        while last_line < len(self._lines) and (not new_lines or new_lines[-1][-1] not in LINE_ENDINGS):
+            region += self._lines[last_line]
+            last_line += 1
+            new_lines = region.splitlines(keepends=True)
+
+        self._replace_line_starts(first_line, last_line, region_start, new_lines, len(inserted) - deleted)
+        self._replace_lines(first_line, last_line, new_lines)
+        self._content_length += len(inserted) - deleted
+        self._content = None
+
+    def _update_welsh_non_gsm_characters(self, deleted, inserted):
+        self._welsh_non_gsm_characters.subtract(c for c in deleted if c in SanitiseSMS.WELSH_NON_GSM_CHARACTERS)
+        self._welsh_non_gsm_characters.update(c for c in inserted if c in SanitiseSMS.WELSH_NON_GSM_CHARACTERS)
+        self._welsh_non_gsm_characters = +self._welsh_non_gsm_characters
+
+    def _get_line_start(self, index):
+        if index >= len(self._lines):
+            return self._content_length
+        if index > self._step_line:
+            return self._line_starts[index] + self._step_length
+        return self._line_starts[index]
+
+    def _find_line(self, offset):
+        # The index of the line `offset` is in. Line starts are in order either side of
+        # `_step_line`, so each side can be searched on its own.
+        index = bisect_right(self._line_starts, offset, 0, self._step_line + 1) - 1
+        if index == self._step_line:
+            index = bisect_right(self._line_starts, offset - self._step_length, self._step_line + 1) - 1
+        return index
+
+    def _get_lines_around(self, start, end):
+        """
+        Returns the range of lines an edit between `start` and `end` touches. This includes
+        the line before, because a carriage return at the end of it could pair with a newline
+        inserted at the start of the next line.
+        """
+        if start < self._content_length:
+            first_line = self._find_line(start)
+        else:
+            # The edit is at the very end of the content
+            first_line = max(len(self._lines) - 1, 0)
+        last_line = self._find_line(end) + 1 if end < self._content_length else len(self._lines)
+        return max(first_line - 1, 0), last_line
+
+    def _move_step(self, line):
+        # Brings the line starts up to date up to and including `line`, and no further
+        if line > self._step_line:
+            for index in range(self._step_line + 1, line + 1):
+                self._line_starts[index] += self._step_length
+        else:
+            for index in range(line + 1, self._step_line + 1):
+                self._line_starts[index] -= self._step_length
+        self._step_line = line
+
+    def _replace_line_starts(self, first_line, last_line, region_start, new_lines, change_in_length):
+        self._move_step(last_line - 1)
+        new_line_starts = []
+        for line in new_lines:
+            new_line_starts.append(region_start)
+            region_start += len(line)
+        self._line_starts[first_line:last_line] = new_line_starts
+        # The lines after the new ones move by however much longer or shorter the edit
+        # made the content
+        self._step_line = first_line + len(new_lines) - 1
+        self._step_length += change_in_length
+
+    def _replace_lines(self, first_line, last_line, new_lines):
+        self._update_totals(first_line, last_line, -1)
+        self._lines[first_line:last_line] = new_lines
+        self._line_stats[first_line:last_line] = map(get_line_stats, new_lines)
+        self._update_totals(first_line, first_line + len(new_lines), +1)
+
+    def _update_totals(self, first_line, last_line, sign):
+        for stats in self._line_stats[first_line:last_line]:
+            self._length += sign * stats.length
+            self._extended_gsm_count += sign * stats.extended_gsm_count
+            self._non_empty_line_count += sign * (not stats.is_empty)
+            self._unclosed_placeholder_count += sign * stats.has_unclosed_placeholder
+
+        # A run of empty lines between two non-empty lines becomes a blank line, so keep
+        # count of non-empty lines which come straight after an empty one. This includes
+        # the line after the ones being replaced, because the line before it may change.
+        for index in range(max(first_line, 1), min(last_line + 1, len(self._line_stats))):
+            previous_line, line = self._line_stats[index - 1], self._line_stats[index]
+            if previous_line.is_empty and not line.is_empty:
+                self._non_empty_lines_after_empty_line_count += sign
+            if previous_line.ends_with_carriage_return and line.is_only_conditionals_before_newline:
+                self._joined_line_endings_count += sign
+
+    @property
+    def _newline_count(self):
+        if not self._non_empty_line_count:
+            return 0
+        # Non-empty lines are joined by one newline, or two if there were empty lines
+        # between them. Empty lines at the start are stripped.
+        return (
+            self._non_empty_line_count - 1 + self._non_empty_lines_after_empty_line_count - self._line_stats[0].is_empty
+        )
+
+    @property
+    def _needs_template(self):
+        return bool(self._unclosed_placeholder_count or self._joined_line_endings_count)
+
+    @property
+    def _template(self):
+        return BroadcastMessageTemplate.from_content(self.content)
+
+    @property
+    def content_count(self):
+        if self._needs_template:
+            return self._template.content_count
+        return self._length + self._newline_count
+
+    @property
+    def encoded_content_count(self):
+        if self._needs_template:
+            return self._template.encoded_content_count
+        if self.non_gsm_characters:
+            return self.content_count
+        return self.content_count + self._extended_gsm_count
+
+    @property
+    def non_gsm_characters(self):
+        return set(self._welsh_non_gsm_characters)
+
+    @property
+    def max_content_count(self):
+        if self.non_gsm_characters:
+            return self.MAX_CONTENT_COUNT_UCS2
+        return self.MAX_CONTENT_COUNT_GSM
+
+    @property
+    def content_too_long(self):
+        return self.encoded_content_count > self.max_content_count
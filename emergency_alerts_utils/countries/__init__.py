@@ -1,17 +1,27 @@
+from bisect import bisect_left
 from functools import lru_cache
 
 from emergency_alerts_utils.insensitive_dict import InsensitiveDict
 from emergency_alerts_utils.sanitise_text import SanitiseASCII
 
-from .data import (
-    ADDITIONAL_SYNONYMS,
-    COUNTRIES_AND_TERRITORIES,
-    UK_ISLANDS,
-    WELSH_NAMES,
-)
+from . import data
+from .fuzzy import FuzzyIndex
 
 
 class CountryMapping(InsensitiveDict):
+    # Lookups also try the key with each of these in front of it, in this order, so that (for
+    # example) `Gambia` finds `The Gambia`. Since `make_key("the gambia")` is always
+    # `make_key("the ") + make_key("gambia")`, each key is also indexed without them.
+    ARTICLES = ("the", "yr", "y")
+
+    def __init__(self, row_dict):
+        # Normalised key or alias -> (priority, value), where an exact match has priority 0
+        # and a key found by adding an article has the position of that article plus 1
+        self._index = {}
+        self._sorted_index_keys = None
+        self._fuzzy_index = None
+        super().__init__(row_dict)
+
     @staticmethod
     @lru_cache(maxsize=2048, typed=False)
     def make_key(original_key):
@@ -25,6 +35,20 @@ class CountryMapping(InsensitiveDict):
 
         return SanitiseASCII.encode(normalised)
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        key = self.make_key(key)
+        self._add_to_index(key, 0, value)
+        for priority, article in enumerate(self.ARTICLES, start=1):
+            if key.startswith(article):
+                self._add_to_index(key[len(article) :], priority, value)
+        self._sorted_index_keys = None
+        self._fuzzy_index = None
+
+    def _add_to_index(self, key, priority, value):
+        if key not in self._index or self._index[key][0] >= priority:
+            self._index[key] = (priority, value)
+
     def __contains__(self, key):
         if any(c.isdigit() for c in key):
             # A string with a digit can’t be a country and is probably a
@@ -35,19 +59,95 @@ class CountryMapping(InsensitiveDict):
         return super().__contains__(key)
 
     def __getitem__(self, key):
-        for key_ in (key, f"the {key}", f"yr {key}", f"y {key}"):
-            if key_ in self:
-                return super().__getitem__(key_)
+        if not any(c.isdigit() for c in key) and (match := self._index.get(self.make_key(key))):
+            return match[1]
 
         raise CountryNotFoundError(f"Not a known country or territory ({key})")
 
-
-countries = CountryMapping(dict(COUNTRIES_AND_TERRITORIES + UK_ISLANDS + WELSH_NAMES + ADDITIONAL_SYNONYMS))
+    def __reduce__(self):
+        # Pickle the normalised keys and the index, so that unpickling doesn't have to
+        # normalise every key again
+        return self._from_index, (dict(self), self._index)
+
+    @classmethod
+    def _from_index(cls, normalised_items, index):
+        mapping = cls.__new__(cls)
+        dict.update(mapping, normalised_items)
+        mapping._index = index
+        mapping._sorted_index_keys = None
+        mapping._fuzzy_index = None
+        return mapping
+
+    def search(self, prefix, limit=None):
+        """
+        Returns the canonical names of countries with a name or synonym starting with
+        `prefix`, without duplicates, for type-ahead country pickers
+        """
+        if self._sorted_index_keys is None:
+            self._sorted_index_keys = sorted(self._index)
+
+        prefix = self.make_key(prefix)
+        results = {}
+
+        for position in range(bisect_left(self._sorted_index_keys, prefix), len(self._sorted_index_keys)):
+            key = self._sorted_index_keys[position]
+            if not key.startswith(prefix) or len(results) == limit:
+                break
+            results.setdefault(self._index[key][1])
+
+        return list(results)
+
+    def fuzzy_search(self, name, max_distance=2, limit=None):
+        """
+        Returns `(canonical name, distance)` for countries with a name or synonym within
+        `max_distance` edits of `name` once both are normalised, closest first, for
+        resolving misspelt countries without a person having to look at them
+        """
+        if any(c.isdigit() for c in name):
+            return []
+
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self._index)
+
+        # Canonical name -> (distance, priority, key) of the closest match for it
+        closest = {}
+        for key, distance in self._fuzzy_index.search(self.make_key(name), max_distance):
+            priority, canonical = self._index[key]
+            closest[canonical] = min(closest.get(canonical, (distance, priority, key)), (distance, priority, key))
+
+        ranked = sorted(closest.items(), key=lambda item: (item[1], item[0]))
+        return [(canonical, distance) for canonical, (distance, _, _) in ranked[:limit]]
+
+
+def make_countries(tables):
+    return CountryMapping(
+        dict(
+            tables["COUNTRIES_AND_TERRITORIES"]
+            + tables["UK_ISLANDS"]
+            + tables["WELSH_NAMES"]
+            + tables["ADDITIONAL_SYNONYMS"]
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def get_countries():
+    tables = data.load()
+    if "countries" in tables:
+        return tables["countries"]
+    return make_countries(tables)
+
+
+def __getattr__(name):
+    # `countries` is built the first time it's used, rather than when this module is imported
+    if name == "countries":
+        return get_countries()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Country:
     def __init__(self, given_name):
-        self.canonical_name = countries[given_name]
+        self.canonical_name = get_countries()[given_name]
 
     def __eq__(self, other):
         return self.canonical_name == other.canonical_name
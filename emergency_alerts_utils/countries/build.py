@@ -0,0 +1,32 @@
+"""
+Builds the artefact that `emergency_alerts_utils.countries.data` loads the country tables
+from, so that importing them doesn't have to parse and resolve the location graph. Run
+this after changing anything in `_data`:
+
+    python -m emergency_alerts_utils.countries.build
+"""
+
+import pickle
+
+from emergency_alerts_utils.countries import make_countries
+from emergency_alerts_utils.countries.data import ARTEFACT_PATH, load_from_source
+
+# The oldest protocol which supports everything in the artefact efficiently, so it can
+# be read by any supported version of Python
+PICKLE_PROTOCOL = 4
+
+
+def build():
+    tables = load_from_source()
+    tables["countries"] = make_countries(tables)
+    return tables
+
+
+def main():
+    with open(ARTEFACT_PATH, "wb") as artefact:
+        pickle.dump(build(), artefact, protocol=PICKLE_PROTOCOL)
+    print(f"Wrote {ARTEFACT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
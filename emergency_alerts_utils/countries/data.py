@@ -1,5 +1,24 @@
 import json
 import os
+import pickle
+from functools import lru_cache
+
+# The tables below are resolved from the files in `_data` by `load_from_source`, which
+# parses the whole location graph. `python -m emergency_alerts_utils.countries.build`
+# saves the result to this file so that it can be loaded without doing that. Either way
+# they are only loaded the first time one of them is used.
+ARTEFACT_PATH = os.path.join(os.path.dirname(__file__), "_data", "countries.pickle")
+
+LAZY_ATTRIBUTES = (
+    "ADDITIONAL_SYNONYMS",
+    "WELSH_NAMES",
+    "_UK_ISLANDS_LIST",
+    "CURRENT_AND_ENDED_COUNTRIES_AND_TERRITORIES",
+    "COUNTRIES_AND_TERRITORIES",
+    "UK_ISLANDS",
+)
+
+UK = "United Kingdom"
 
 
 def _load_data(filename):
@@ -19,28 +38,50 @@ def find_canonical(item, graph, key):
     )
 
 
-# Copied from
-# https://github.com/alphagov/govuk-country-and-territory-autocomplete
-# /blob/b61091a502983fd2a77b3cdb5f94a604412eb093
-# /dist/location-autocomplete-graph.json
-_graph = _load_data("location-autocomplete-graph.json")
+def load_from_source():
+    # Copied from
+    # https://github.com/alphagov/govuk-country-and-territory-autocomplete
+    # /blob/b61091a502983fd2a77b3cdb5f94a604412eb093
+    # /dist/location-autocomplete-graph.json
+    graph = _load_data("location-autocomplete-graph.json")
+    uk_islands_list = _load_data("uk-islands.txt")
+
+    current_and_ended_countries_and_territories = [
+        find_canonical(item, graph, item["names"]["en-GB"]) for item in graph.values()
+    ]
+
+    countries_and_territories = []
+
+    for synonym, canonical in current_and_ended_countries_and_territories:
+        if canonical in uk_islands_list:
+            countries_and_territories.append((synonym, UK))
+        else:
+            countries_and_territories.append((synonym, canonical))
+
+    return {
+        "ADDITIONAL_SYNONYMS": list(_load_data("synonyms.json").items()),
+        "WELSH_NAMES": list(_load_data("welsh-names.json").items()),
+        "_UK_ISLANDS_LIST": uk_islands_list,
+        "CURRENT_AND_ENDED_COUNTRIES_AND_TERRITORIES": current_and_ended_countries_and_territories,
+        "COUNTRIES_AND_TERRITORIES": countries_and_territories,
+        "UK_ISLANDS": [(synonym, UK) for synonym in uk_islands_list],
+    }
 
-UK = "United Kingdom"
 
-ADDITIONAL_SYNONYMS = list(_load_data("synonyms.json").items())
-WELSH_NAMES = list(_load_data("welsh-names.json").items())
-_UK_ISLANDS_LIST = _load_data("uk-islands.txt")
+def load_artefact():
+    try:
+        with open(ARTEFACT_PATH, "rb") as artefact:
+            return pickle.load(artefact)
+    except FileNotFoundError:
+        return None
 
-CURRENT_AND_ENDED_COUNTRIES_AND_TERRITORIES = [
-    find_canonical(item, _graph, item["names"]["en-GB"]) for item in _graph.values()
-]
 
-COUNTRIES_AND_TERRITORIES = []
+@lru_cache(maxsize=None)
+def load():
+    return load_artefact() or load_from_source()
 
-for synonym, canonical in CURRENT_AND_ENDED_COUNTRIES_AND_TERRITORIES:
-    if canonical in _UK_ISLANDS_LIST:
-        COUNTRIES_AND_TERRITORIES.append((synonym, UK))
-    else:
-        COUNTRIES_AND_TERRITORIES.append((synonym, canonical))
 
-UK_ISLANDS = [(synonym, UK) for synonym in _UK_ISLANDS_LIST]
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        return load()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,144 @@
+from collections import Counter, defaultdict
+
+
+def get_bigrams(word):
+    # Padded, so that the first and last characters count as much as the ones in between
+    padded = f"^{word}$"
+    return [padded[i : i + 2] for i in range(len(padded) - 1)]
+
+
+def get_character_mask(word):
+    # A bit for each character in the word. Different characters can share a bit, which
+    # means the mask can undercount the differences between words but never overcount them.
+    mask = 0
+    for character in word:
+        mask |= 1 << (ord(character) % 64)
+    return mask
+
+
+def get_character_difference(first, second):
+    """
+    Returns how many characters would have to be added or removed to turn one `Counter` of
+    characters into the other, whichever is more
+    """
+    removed = 0
+    for character, count in first.items():
+        if count > (other_count := second.get(character, 0)):
+            removed += count - other_count
+    # Whatever isn't accounted for by removing characters has to be added
+    return max(removed, removed + second.total() - first.total())
+
+
+def get_edit_distance(first, second, max_distance):
+    """
+    Returns the number of insertions, deletions, substitutions or transpositions of two
+    adjacent characters needed to turn `first` into `second` (the optimal string alignment
+    distance), or `max_distance + 1` as soon as it's clear it will be more than
+    `max_distance`
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    previous_previous_row, previous_row = None, list(range(len(second) + 1))
+
+    for i, first_character in enumerate(first, start=1):
+        row = [i]
+        for j, second_character in enumerate(second, start=1):
+            # This is the minimum of the costs of each possible edit, but with comparisons
+            # rather than calls to `min`, which is noticeably faster
+            distance = previous_row[j - 1] + (first_character != second_character)
+            if previous_row[j] < distance:
+                distance = previous_row[j] + 1
+            if row[j - 1] < distance:
+                distance = row[j - 1] + 1
+            if (
+                i > 1
+                and j > 1
+                and first_character == second[j - 2]
+                and first[i - 2] == second_character
+                and previous_previous_row[j - 2] < distance
+            ):
+                distance = previous_previous_row[j - 2] + 1
+            row.append(distance)
+
+        if min(row) > max_distance:
+            return max_distance + 1
+
+        previous_previous_row, previous_row = previous_row, row
+
+    return min(previous_row[-1], max_distance + 1)
+
+
+class FuzzyIndex:
+    """
+    Finds the keys within a given edit distance of a word.
+
+    Every key is indexed by its bigrams. A single edit changes at most 3 of the bigrams in
+    a word (a transposition of `ab` in `xaby` changes `xa`, `ab` and `by`), so a key within
+    `n` edits of a word has to share at least `len(bigrams) - 3n` of them. Only keys which
+    do are compared with the word, rather than all of them.
+    """
+
+    BIGRAMS_CHANGED_PER_EDIT = 3
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.lengths = []
+        self.character_masks = []
+        self.character_counts = []
+        self.postings = defaultdict(list)
+        self.keys_by_length = defaultdict(list)
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        key_id = len(self.keys)
+        self.keys.append(key)
+        self.lengths.append(len(key))
+        self.character_masks.append(get_character_mask(key))
+        self.character_counts.append(Counter(key))
+        self.keys_by_length[len(key)].append(key_id)
+        for bigram in get_bigrams(key):
+            self.postings[bigram].append(key_id)
+
+    def search(self, word, max_distance):
+        """
+        Returns a list of `(key, distance)` for every key within `max_distance` edits of
+        `word`
+        """
+        character_mask, character_counts = get_character_mask(word), Counter(word)
+        return [
+            (self.keys[key_id], distance)
+            for key_id in self._get_candidates(word, max_distance)
+            # Each edit adds or removes at most one character, so if the characters in the
+            # two differ by more than `max_distance` there's no need to work out the distance
+            if (character_mask & ~self.character_masks[key_id]).bit_count() <= max_distance
+            and (self.character_masks[key_id] & ~character_mask).bit_count() <= max_distance
+            and get_character_difference(character_counts, self.character_counts[key_id]) <= max_distance
+            and (distance := get_edit_distance(word, self.keys[key_id], max_distance)) <= max_distance
+        ]
+
+    def _get_candidates(self, word, max_distance):
+        # Counts each shared bigram once for every time it appears in both, which can be
+        # more than the true number shared, so lets through more candidates but never fewer
+        shared = Counter()
+        for bigram in get_bigrams(word):
+            shared.update(self.postings.get(bigram, ()))
+
+        bigrams_allowed_to_change = self.BIGRAMS_CHANGED_PER_EDIT * max_distance
+        # The number of bigrams a key of each length has to share with the word
+        minimum_shared = {
+            length: max(len(word), length) + 1 - bigrams_allowed_to_change
+            for length in range(max(len(word) - max_distance, 0), len(word) + max_distance + 1)
+        }
+        candidates = {
+            key_id for key_id, count in shared.items() if count >= minimum_shared.get(self.lengths[key_id], count + 1)
+        }
+
+        # Keys which are short enough don't need to share any bigrams with a word which is
+        # short enough, so won't have been counted
+        if len(word) < bigrams_allowed_to_change:
+            for length in range(max(len(word) - max_distance, 0), bigrams_allowed_to_change):
+                candidates.update(self.keys_by_length.get(length, ()))
+
+        return candidates
@@ -1,4 +1,8 @@
 import re
+import threading
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from types import MappingProxyType
 
 from markupsafe import Markup
 from ordered_set import OrderedSet
@@ -12,27 +16,57 @@ from emergency_alerts_utils.insensitive_dict import InsensitiveDict
 
 
 class Placeholder:
-    def __init__(self, body):
+    """
+    An immutable, parsed placeholder. Placeholders are interned by body, so parsing the
+    same placeholder again (for example on every render of a template) returns the same
+    object rather than making a new one.
+    """
+
+    __slots__ = ("body", "name", "_conditional_text")
+
+    def __new__(cls, body):
         # body shouldn’t include leading/trailing brackets, like (( and ))
-        self.body = body.lstrip("(").rstrip(")")
+        return _get_interned_placeholder(cls, body.lstrip("(").rstrip(")"))
+
+    @classmethod
+    def _parse(cls, body):
+        placeholder = object.__new__(cls)
+        # for non conditionals, name equals body
+        name, separator, conditional_text = body.partition("??")
+        object.__setattr__(placeholder, "body", body)
+        object.__setattr__(placeholder, "name", name)
+        object.__setattr__(placeholder, "_conditional_text", conditional_text if separator else None)
+        return placeholder
 
     @classmethod
     def from_match(cls, match):
         return cls(match.group(0))
 
-    def is_conditional(self):
-        return "??" in self.body
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
 
-    @property
-    def name(self):
-        # for non conditionals, name equals body
-        return self.body.split("??")[0]
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return self.__class__, (self.body,)
+
+    def __eq__(self, other):
+        if not other.__class__ == self.__class__:
+            return False
+        return self.body == other.body
+
+    def __hash__(self):
+        return hash(self.body)
+
+    def is_conditional(self):
+        return self._conditional_text is not None
 
     @property
     def conditional_text(self):
         if self.is_conditional():
             # ((a?? b??c)) returns " b??c"
-            return "??".join(self.body.split("??")[1:])
+            return self._conditional_text
         else:
             raise ValueError(f"{self} not conditional")
 
@@ -47,6 +81,11 @@ class Placeholder:
         return f"Placeholder({self.body})"
 
 
+@lru_cache(maxsize=4096)
+def _get_interned_placeholder(cls, body):
+    return cls._parse(body)
+
+
 class Field:
     """
     An instance of Field represents a string of text which may contain
@@ -183,6 +222,100 @@ class PlainTextField(Field):
     placeholder_tag_redacted = "[hidden]"
 
 
+# Everything about the placeholders in a piece of content, worked out in one pass:
+# - `names`: an `OrderedSet` of placeholder names, in the order they first appear
+# - `keys`: the normalised key of each name (see `InsensitiveDict.make_key`), in the same order
+# - `conditionals`: whether each name is used as a conditional placeholder, in the same order
+# - `names_by_key`: a read-only mapping of normalised key to name, like `InsensitiveDict.from_keys(names)`
+PlaceholderInfo = namedtuple("PlaceholderInfo", ["names", "keys", "conditionals", "names_by_key"])
+
+PlaceholderIndexStats = namedtuple("PlaceholderIndexStats", ["hits", "misses", "evictions", "currsize", "maxsize"])
+
+
+class PlaceholderIndex:
+    """
+    A thread-safe, size-bounded LRU cache of `PlaceholderInfo` by content.
+
+    It keeps counts of hits, misses and evictions so its size can be tuned from
+    production traffic, for example by periodically logging `placeholder_index.stats`.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+
+    def __getitem__(self, content):
+        with self._lock:
+            if content in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(content)
+                return self._cache[content]
+
+        info = self._get_placeholder_info(content)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[content] = info
+            self._evict()
+
+        return info
+
+    @staticmethod
+    def _get_placeholder_info(content):
+        conditionals = {}
+
+        for body in Field.placeholder_pattern.findall(content or ""):
+            placeholder = Placeholder(body)
+            conditionals[placeholder.name] = conditionals.get(placeholder.name, False) or placeholder.is_conditional()
+
+        names = OrderedSet(conditionals)
+        keys = tuple(InsensitiveDict.make_key(name) for name in names)
+
+        return PlaceholderInfo(
+            names=names,
+            keys=keys,
+            conditionals=tuple(conditionals.values()),
+            names_by_key=MappingProxyType(dict(zip(keys, names, strict=True))),
+        )
+
+    def _evict(self):
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            return PlaceholderIndexStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                currsize=len(self._cache),
+                maxsize=self.maxsize,
+            )
+
+    @property
+    def hit_rate(self):
+        stats = self.stats
+        lookups = stats.hits + stats.misses
+        return stats.hits / lookups if lookups else 0.0
+
+
+placeholder_index = PlaceholderIndex()
+
+
 def str2bool(value):
     if not value:
         return False
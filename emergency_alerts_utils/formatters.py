@@ -67,36 +67,53 @@ def add_prefix(body, prefix=None):
     return body
 
 
-def make_link_from_url(linked_part, *, classes=""):
+TRAILING_CHARACTERS_NOT_IN_LINK = ")]'.,:"
+
+CORRESPONDING_OPENING_CHARACTER_MAP = {
+    ")": "(",
+    "]": "[",
+}
+
+
+def split_trailing_characters_from_url(linked_part):
     """
-    Takes something which looks like a URL, works out which trailing characters shouldn’t
-    be considered part of the link and returns an HTML <a> tag
+    Works out which trailing characters of something which looks like a URL shouldn’t be
+    considered part of the link. Closing brackets are kept if they balance an opening
+    bracket earlier in the link.
+
+    Brackets are counted once up front, so this is linear in the length of the link no
+    matter how much trailing punctuation there is.
 
     input: `http://example.com/foo_(bar)).`
-    output: `<a href="http://example.com/foo_(bar)">http://example.com/foo_(bar)</a>).`
+    output: `("http://example.com/foo_(bar)", ").")`
     """
-    CORRESPONDING_OPENING_CHARACTER_MAP = {
-        ")": "(",
-        "]": "[",
-        "'": None,
-        ".": None,
-        ",": None,
-        ":": None,
+    unbalanced_closing_characters = {
+        closing_character: linked_part.count(closing_character) - linked_part.count(opening_character)
+        for closing_character, opening_character in CORRESPONDING_OPENING_CHARACTER_MAP.items()
     }
 
-    trailing_characters = ""
+    end = len(linked_part)
 
-    while (last_character := linked_part[-1]) in CORRESPONDING_OPENING_CHARACTER_MAP.keys():
-        corresponding_opening_character = CORRESPONDING_OPENING_CHARACTER_MAP[last_character]
-
-        if corresponding_opening_character:
-            count_opening_characters = linked_part.count(corresponding_opening_character)
-            count_closing_characters = linked_part.count(last_character)
-            if count_opening_characters >= count_closing_characters:
+    while end and (last_character := linked_part[end - 1]) in TRAILING_CHARACTERS_NOT_IN_LINK:
+        if last_character in unbalanced_closing_characters:
+            if unbalanced_closing_characters[last_character] <= 0:
                 break
+            unbalanced_closing_characters[last_character] -= 1
+
+        end -= 1
 
-        trailing_characters = linked_part[-1] + trailing_characters
-        linked_part = linked_part[:-1]
+    return linked_part[:end], linked_part[end:]
+
+
+def make_link_from_url(linked_part, *, classes=""):
+    """
+    Takes something which looks like a URL, works out which trailing characters shouldn’t
+    be considered part of the link and returns an HTML <a> tag
+
+    input: `http://example.com/foo_(bar)).`
+    output: `<a href="http://example.com/foo_(bar)">http://example.com/foo_(bar)</a>).`
+    """
+    linked_part, trailing_characters = split_trailing_characters_from_url(linked_part)
 
     return f"{create_sanitised_html_for_url(linked_part, classes=classes)}{trailing_characters}"
 
@@ -113,6 +130,32 @@ def autolink_urls(value, *, classes=""):
     )
 
 
+def iter_autolinked_urls(value, *, classes=""):
+    """
+    Generator form of `autolink_urls`. Yields the (already escaped) value in chunks, with
+    each URL replaced by an HTML <a> tag, so that long bodies can be streamed without
+    building the whole linked string in memory.
+
+    `Markup("".join(iter_autolinked_urls(value)))` is the same as `autolink_urls(value)`.
+    """
+    position = 0
+
+    for match in url.finditer(value):
+        start, end = match.span()
+        if start > position:
+            yield Markup(value[position:start])
+
+        linked_part, trailing_characters = split_trailing_characters_from_url(match.group(0))
+        yield Markup(create_sanitised_html_for_url(linked_part, classes=classes))
+        if trailing_characters:
+            yield Markup(trailing_characters)
+
+        position = end
+
+    if position < len(value):
+        yield Markup(value[position:])
+
+
 def create_sanitised_html_for_url(link, *, classes="", style=""):
     """
     takes a link and returns an <a> tag to that link. We escape the link that goes into the `href` attribute to
@@ -1,7 +1,15 @@
+import sys
+from collections import namedtuple
 from functools import lru_cache
 
 from ordered_set import OrderedSet
 
+# Each original key is normalised once, for as long as it's in the cache. Every row of a
+# file is looked up with the same few headings and placeholder names, so this needs to be
+# larger than the number of those in a file, but is bounded because they come from
+# uploaded files.
+NORMALISED_KEY_CACHE_SIZE = 4096
+
 
 class InsensitiveDict(dict):
     """
@@ -43,7 +51,7 @@ class InsensitiveDict(dict):
         return super().__contains__(self.make_key(key))
 
     def get(self, key, default=None):
-        return self[key] if key in self else default
+        return super().get(self.make_key(key), default)
 
     def copy(self):
         return self.__class__(super().copy())
@@ -52,11 +60,13 @@ class InsensitiveDict(dict):
         return {key: self.get(key) for key in keys}
 
     @staticmethod
-    @lru_cache(maxsize=32, typed=False)
+    @lru_cache(maxsize=NORMALISED_KEY_CACHE_SIZE)
     def make_key(original_key):
         if original_key is None:
             return None
-        return original_key.translate(InsensitiveDict.KEY_TRANSLATION_TABLE).lower()
+        # Interned, so that every original key which normalises to the same thing shares
+        # one string
+        return sys.intern(original_key.translate(InsensitiveDict.KEY_TRANSLATION_TABLE).lower())
 
 
 class Row(InsensitiveDict):
@@ -71,6 +81,7 @@ class Row(InsensitiveDict):
         error_fn,
         template,
         validate_row=True,
+        placeholders=None,
     ):
         # If we don't need to validate, then:
         # by not setting template we avoid the template level validation (used to check message length)
@@ -80,6 +91,7 @@ class Row(InsensitiveDict):
             error_fn = None
 
         self.index = index
+        self.placeholders = InsensitiveDict.from_keys(placeholders or ())
 
         if template:
             template.values = row_dict
@@ -144,3 +156,158 @@ class Cell:
     @property
     def recipient_error(self):
         return self.error not in {None, self.missing_field_error}
+
+
+RowSummary = namedtuple("RowSummary", ["index", "has_error", "has_missing_data"])
+
+
+def _set_bits(bitmap, offset, flags):
+    for position, flag in enumerate(flags, start=offset):
+        if flag:
+            bitmap[position >> 3] |= 1 << (position & 7)
+
+
+def _get_bit(bitmap, position):
+    return bool(bitmap[position >> 3] & (1 << (position & 7)))
+
+
+class ColumnarRows:
+    """
+    Validates a table one column at a time, rather than building a `Row` of `Cell`s for
+    every row in it.
+
+    Rows are added in chunks, either as one sequence of values per heading with
+    `add_columns` or as an iterable of row dicts with `add_rows`. For each cell in the chunk
+    only two bits are kept, in one bitmap per column: whether it has an error, and whether
+    that error is missing data. The values of a row are only kept if it has an error, so
+    that it can be materialised as a `Row` later. Everything else is thrown away once the
+    chunk is validated, so memory use is bounded by the chunk size and number of errors.
+
+    `error_fn` is called the same way as for `Cell`. Alternatively `batch_error_fn` is
+    called once per column per chunk, with the heading and the list of values, and returns
+    a list of errors in the same order.
+
+    Checks which need the whole row, like the length of the message, aren't done here. Pass
+    a `template` to `rows_with_errors` to have them done for the rows which are materialised.
+    """
+
+    def __init__(self, headings, *, error_fn=None, batch_error_fn=None, placeholders=None):
+        if error_fn and batch_error_fn:
+            raise TypeError("Pass one of error_fn or batch_error_fn, not both")
+        self.headings = list(headings)
+        self.error_fn = error_fn
+        self.batch_error_fn = batch_error_fn
+        self.placeholders = placeholders
+        self.row_count = 0
+        self.error_bitmaps = {heading: bytearray() for heading in self.headings}
+        self.missing_data_bitmaps = {heading: bytearray() for heading in self.headings}
+        self._error_bitmap = bytearray()
+        self._missing_data_bitmap = bytearray()
+        self._rows_with_errors = {}
+
+    def __len__(self):
+        return self.row_count
+
+    def _get_errors(self, heading, values):
+        if self.batch_error_fn:
+            return self.batch_error_fn(heading, values)
+        if self.error_fn:
+            return [self.error_fn(heading, value) for value in values]
+        return [None] * len(values)
+
+    def _grow_bitmaps(self, row_count):
+        size = (row_count + 7) >> 3
+        for bitmap in (
+            self._error_bitmap,
+            self._missing_data_bitmap,
+            *self.error_bitmaps.values(),
+            *self.missing_data_bitmaps.values(),
+        ):
+            bitmap.extend(bytes(size - len(bitmap)))
+
+    def add_columns(self, columns):
+        """
+        Validates a chunk of rows given as a dict of heading to a list of values, with one
+        list for each heading and all of them the same length
+        """
+        columns = {heading: list(columns[heading]) for heading in self.headings}
+        chunk_size = len(next(iter(columns.values()), []))
+        if any(len(values) != chunk_size for values in columns.values()):
+            raise ValueError("Every column must have the same number of values")
+
+        offset = self.row_count
+        self._grow_bitmaps(offset + chunk_size)
+        rows_with_errors = set()
+
+        for heading, values in columns.items():
+            errors = self._get_errors(heading, values)
+            _set_bits(self.error_bitmaps[heading], offset, errors)
+            _set_bits(self.missing_data_bitmaps[heading], offset, (e == Cell.missing_field_error for e in errors))
+            rows_with_errors.update(index for index, error in enumerate(errors) if error)
+
+        for index in sorted(rows_with_errors):
+            self._rows_with_errors[offset + index] = {heading: columns[heading][index] for heading in self.headings}
+
+        for heading in self.headings:
+            self._merge_bitmap(self._error_bitmap, self.error_bitmaps[heading], offset)
+            self._merge_bitmap(self._missing_data_bitmap, self.missing_data_bitmaps[heading], offset)
+
+        self.row_count += chunk_size
+
+    @staticmethod
+    def _merge_bitmap(into, bitmap, offset):
+        # Only the bytes this chunk touched can have changed
+        for position in range(offset >> 3, len(bitmap)):
+            into[position] |= bitmap[position]
+
+    def add_rows(self, rows, chunk_size=1000):
+        """
+        Validates an iterable of row dicts, `chunk_size` rows at a time. Headings missing
+        from a row are treated as empty.
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                self._add_row_dicts(chunk)
+                chunk = []
+        if chunk:
+            self._add_row_dicts(chunk)
+
+    def _add_row_dicts(self, rows):
+        self.add_columns({heading: [row.get(heading) for row in rows] for heading in self.headings})
+
+    def has_error(self, index):
+        return _get_bit(self._error_bitmap, index)
+
+    def has_missing_data(self, index):
+        return _get_bit(self._missing_data_bitmap, index)
+
+    @property
+    def has_errors(self):
+        return bool(self._rows_with_errors)
+
+    @property
+    def indexes_with_errors(self):
+        return list(self._rows_with_errors)
+
+    @property
+    def summaries(self):
+        for index in range(self.row_count):
+            yield RowSummary(index, self.has_error(index), self.has_missing_data(index))
+
+    def rows_with_errors(self, template=None):
+        for index, row_dict in self._rows_with_errors.items():
+            yield Row(
+                row_dict,
+                index=index,
+                error_fn=self._row_error_fn,
+                template=template,
+                placeholders=self.placeholders,
+            )
+
+    @property
+    def _row_error_fn(self):
+        if self.error_fn or not self.batch_error_fn:
+            return self.error_fn
+        return lambda heading, value: self.batch_error_fn(heading, [value])[0]
@@ -1,3 +1,98 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
 class Take(str):
     def then(self, func, *args, **kwargs):
         return self.__class__(func(self, *args, **kwargs))
+
+
+# Opt-in instrumentation for `Take` chains.
+#
+# `instrument` swaps `Take.then` for a version which times each stage and reports it to a
+# sink, and `uninstrument` puts the original back. When instrumentation is off `Take.then` is
+# the plain method above, so there is no cost to leaving it switched off in production.
+#
+# A sink is any callable taking the name of the stage (eg `sms_encode` or `str.strip`) and
+# the time it took in seconds.
+
+_uninstrumented_then = Take.then
+_sink = None
+
+
+def get_stage_name(func):
+    func = getattr(func, "func", func)  # unwrap functools.partial
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+def _instrumented_then(self, func, *args, **kwargs):
+    # Read once, so that a stage which is running when `uninstrument` is called still
+    # finishes, and is reported to the sink it started with
+    sink = _sink
+    start = time.perf_counter()
+    try:
+        result = func(self, *args, **kwargs)
+    finally:
+        if sink is not None:
+            sink(get_stage_name(func), time.perf_counter() - start)
+    return self.__class__(result)
+
+
+def instrument(sink):
+    global _sink
+    _sink = sink
+    Take.then = _instrumented_then
+
+
+def uninstrument():
+    global _sink
+    Take.then = _uninstrumented_then
+    _sink = None
+
+
+@contextmanager
+def instrumented(sink):
+    instrument(sink)
+    try:
+        yield sink
+    finally:
+        uninstrument()
+
+
+class TakeStatistics:
+    """
+    A sink which keeps a count of calls and the cumulative time spent in each stage
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.total_seconds = defaultdict(float)
+
+    def __call__(self, stage, seconds):
+        with self._lock:
+            self.calls[stage] += 1
+            self.total_seconds[stage] += seconds
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.total_seconds.clear()
+
+
+class HistogramSink:
+    """
+    A sink which records the duration of each stage in a histogram, tagged with the name of
+    the stage. Works with an OpenTelemetry histogram, for example:
+
+        instrument(HistogramSink(meter.create_histogram("take.stage.duration", unit="s")))
+    """
+
+    def __init__(self, histogram, attribute_name="stage"):
+        self.histogram = histogram
+        self.attribute_name = attribute_name
+
+    def __call__(self, stage, seconds):
+        self.histogram.record(seconds, attributes={self.attribute_name: stage})
@@ -1,13 +1,24 @@
 import math
+import re
 from abc import ABC, abstractmethod
 from functools import lru_cache
+from itertools import product
 from os import path
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from markupsafe import Markup
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
+from markupsafe import Markup, escape
 
 from emergency_alerts_utils import MAGIC_SEQUENCE, SMS_CHAR_COUNT_LIMIT
-from emergency_alerts_utils.field import Field, PlainTextField
+from emergency_alerts_utils.field import (
+    Field,
+    PlainTextField,
+    placeholder_index,
+)
 from emergency_alerts_utils.formatters import (
     add_prefix,
     autolink_urls,
@@ -26,7 +37,36 @@ from emergency_alerts_utils.sanitise_text import SanitiseSMS
 from emergency_alerts_utils.take import Take
 from emergency_alerts_utils.template_change import TemplateChange
 
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    # The cache only saves compiling templates again, so if its directory can't be read or
+    # written to (for example, because it's read-only or belongs to another user) templates
+    # are compiled as if there were no cache, rather than failing to render
+
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except OSError:
+            pass
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def _get_bytecode_cache():
+    # Caches compiled templates in a per-user temporary directory, so only the first process
+    # to import this module has to compile them
+    try:
+        return _BytecodeCache()
+    except (OSError, RuntimeError):
+        return None
+
+
 template_env = Environment(
+    bytecode_cache=_get_bytecode_cache(),
     loader=FileSystemLoader(
         path.join(
             path.dirname(path.abspath(__file__)),
@@ -40,6 +80,39 @@ template_env = Environment(
 )
 
 
+class DirectRenderer:
+    """
+    Renders a Jinja template by joining strings, without going through Jinja, for hot paths.
+
+    The template is rendered once for every combination of `flags`, with markers in place
+    of each of `fields`. Rendering then just fills in the gaps between the literal parts,
+    escaping each value the same way Jinja’s autoescaping would, so the output is
+    identical. Only suitable for templates which use their flags for `{% if %}` blocks and
+    print their fields as-is.
+    """
+
+    MARKER = "\x00{}\x00"
+
+    def __init__(self, jinja_template, flags=(), fields=()):
+        self.flags = flags
+        self.fields = fields
+        marker_pattern = re.compile("\x00({})\x00".format("|".join(map(re.escape, fields))))
+        markers = {field: Markup(self.MARKER.format(field)) for field in fields}
+        self.parts = {
+            combination: tuple(
+                marker_pattern.split(jinja_template.render(dict(zip(flags, combination, strict=True)) | markers))
+            )
+            for combination in product((False, True), repeat=len(flags))
+        }
+
+    def render(self, context):
+        parts = self.parts[tuple(bool(context.get(flag)) for flag in self.flags)]
+        # Parts alternate between literal text from the template and the name of a field
+        return Markup(
+            "".join(part if index % 2 == 0 else escape(context.get(part)) for index, part in enumerate(parts))
+        )
+
+
 class Template(ABC):
     def __init__(
         self,
@@ -92,15 +165,19 @@ class Template(ABC):
         if not value:
             self._values = {}
         else:
-            placeholders = InsensitiveDict.from_keys(self.placeholders)
+            placeholder_info = self.placeholder_info
             self._values = InsensitiveDict(value).as_dict_with_keys(
-                self.placeholders
-                | set(key for key in value.keys() if InsensitiveDict.make_key(key) not in placeholders.keys())
+                placeholder_info.names
+                | set(key for key in value.keys() if InsensitiveDict.make_key(key) not in placeholder_info.names_by_key)
             )
 
+    @property
+    def placeholder_info(self):
+        return placeholder_index[self.content]
+
     @property
     def placeholders(self):
-        return get_placeholders(self.content)
+        return self.placeholder_info.names
 
     @property
     def missing_data(self):
@@ -270,44 +347,45 @@ class SMSPreviewTemplate(BaseSMSTemplate):
         show_sender=False,
         downgrade_non_sms_characters=True,
         redact_missing_personalisation=False,
+        use_jinja=True,
     ):
         self.show_recipient = show_recipient
         self.show_sender = show_sender
         self.downgrade_non_sms_characters = downgrade_non_sms_characters
+        self.use_jinja = use_jinja
         super().__init__(template, values, prefix, show_prefix, sender)
         self.redact_missing_personalisation = redact_missing_personalisation
 
     def __str__(self):
-        return Markup(
-            self.jinja_template.render(
-                {
-                    "sender": self.sender,
-                    "show_sender": self.show_sender,
-                    "recipient": Markup(Field("((phone number))", self.values, with_brackets=False, html="escape")),
-                    "show_recipient": self.show_recipient,
-                    "body": Markup(
-                        Take(
-                            Field(
-                                self.content,
-                                self.values,
-                                html="escape",
-                                redact_missing_personalisation=self.redact_missing_personalisation,
-                            )
-                        )
-                        .then(add_prefix, (escape_html(self.prefix) or None) if self.show_prefix else None)
-                        .then(sms_encode if self.downgrade_non_sms_characters else str)
-                        .then(remove_whitespace_before_punctuation)
-                        .then(normalise_whitespace_and_newlines)
-                        .then(normalise_multiple_newlines)
-                        .then(nl2br)
-                        .then(
-                            autolink_urls,
-                            classes="govuk-link govuk-link--no-visited-state",
-                        )
-                    ),
-                }
-            )
-        )
+        context = {
+            "sender": self.sender,
+            "show_sender": self.show_sender,
+            "recipient": Markup(Field("((phone number))", self.values, with_brackets=False, html="escape")),
+            "show_recipient": self.show_recipient,
+            "body": Markup(
+                Take(
+                    Field(
+                        self.content,
+                        self.values,
+                        html="escape",
+                        redact_missing_personalisation=self.redact_missing_personalisation,
+                    )
+                )
+                .then(add_prefix, (escape_html(self.prefix) or None) if self.show_prefix else None)
+                .then(sms_encode if self.downgrade_non_sms_characters else str)
+                .then(remove_whitespace_before_punctuation)
+                .then(normalise_whitespace_and_newlines)
+                .then(normalise_multiple_newlines)
+                .then(nl2br)
+                .then(
+                    autolink_urls,
+                    classes="govuk-link govuk-link--no-visited-state",
+                )
+            ),
+        }
+        if self.use_jinja:
+            return Markup(self.jinja_template.render(context))
+        return get_direct_renderer(self.jinja_template).render(context)
 
 
 class BaseBroadcastTemplate(BaseSMSTemplate):
@@ -405,6 +483,14 @@ def do_nice_typography(value):
     )
 
 
-@lru_cache(maxsize=1024)
+@lru_cache(maxsize=None)
+def get_direct_renderer(jinja_template):
+    return DirectRenderer(
+        jinja_template,
+        flags=("show_sender", "show_recipient"),
+        fields=("sender", "recipient", "body"),
+    )
+
+
 def get_placeholders(content):
-    return Field(content).placeholders
+    return placeholder_index[content].names
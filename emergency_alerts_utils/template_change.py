@@ -1,12 +1,11 @@
 from ordered_set import OrderedSet
 
-from emergency_alerts_utils.insensitive_dict import InsensitiveDict
-
 
 class TemplateChange:
     def __init__(self, old_template, new_template):
-        self.old_placeholders = InsensitiveDict.from_keys(old_template.placeholders)
-        self.new_placeholders = InsensitiveDict.from_keys(new_template.placeholders)
+        # Normalised placeholder key -> placeholder name
+        self.old_placeholders = old_template.placeholder_info.names_by_key
+        self.new_placeholders = new_template.placeholder_info.names_by_key
 
     @property
     def has_different_placeholders(self):
@@ -15,11 +14,11 @@ class TemplateChange:
     @property
     def placeholders_added(self):
         return OrderedSet(
-            [self.new_placeholders.get(key) for key in self.new_placeholders.keys() - self.old_placeholders.keys()]
+            [self.new_placeholders[key] for key in self.new_placeholders if key not in self.old_placeholders]
         )
 
     @property
     def placeholders_removed(self):
         return OrderedSet(
-            [self.old_placeholders.get(key) for key in self.old_placeholders.keys() - self.new_placeholders.keys()]
+            [self.old_placeholders[key] for key in self.old_placeholders if key not in self.new_placeholders]
         )
@@ -1,7 +1,11 @@
-import re
-from collections import namedtuple
+import os
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import suppress
 from functools import lru_cache
+from itertools import islice, repeat
 
 import phonenumbers
 from flask import current_app
@@ -11,7 +15,7 @@ from emergency_alerts_utils.formatters import (
     strip_and_remove_obscure_whitespace,
 )
 
-from . import EMAIL_REGEX_PATTERN, hostname_part, tld_part
+from . import email_regex, hostname_part, tld_part
 
 uk_prefix = "44"
 
@@ -34,28 +38,68 @@ class InvalidAddressError(InvalidEmailError):
     pass
 
 
+PHONE_NUMBER_DELETION_TABLE = str.maketrans("", "", ALL_WHITESPACE + "()-+")
+
+# Used to join numbers together so they can be normalised in one go. It isn't a digit, so
+# can't end up in a valid number.
+PHONE_NUMBER_SEPARATOR = "\x00"
+
+
 def normalise_phone_number(number):
-    for character in ALL_WHITESPACE + "()-+":
-        number = number.replace(character, "")
+    number = number.translate(PHONE_NUMBER_DELETION_TABLE)
 
-    try:
-        list(map(int, number))
-    except ValueError:
+    # `isdecimal` accepts the same characters as `int` does, but is always false for an
+    # empty string, which is allowed here
+    if number and not number.isdecimal():
         raise InvalidPhoneError("Must not contain letters or symbols")
 
     return number.lstrip("0")
 
 
+def normalise_phone_numbers(numbers):
+    """
+    Normalises a list of phone numbers in one pass. Returns a list of the normalised numbers
+    and a list of the `InvalidPhoneError` that `normalise_phone_number` would have raised for
+    each, with `None` in the other list where there wasn't one.
+    """
+    joined = PHONE_NUMBER_SEPARATOR.join(numbers).translate(PHONE_NUMBER_DELETION_TABLE)
+    normalised = joined.split(PHONE_NUMBER_SEPARATOR)
+
+    if len(normalised) != len(numbers):
+        # One of the numbers contained the separator
+        return _normalise_phone_numbers_one_at_a_time(numbers)
+
+    if joined.replace(PHONE_NUMBER_SEPARATOR, "").isdecimal() or not joined.strip(PHONE_NUMBER_SEPARATOR):
+        return list(map(str.lstrip, normalised, repeat("0"))), [None] * len(normalised)
+
+    return _normalise_phone_numbers_one_at_a_time(normalised)
+
+
+def _normalise_phone_numbers_one_at_a_time(numbers):
+    normalised, errors = [], []
+    for number in numbers:
+        try:
+            normalised.append(normalise_phone_number(number))
+            errors.append(None)
+        except InvalidPhoneError as e:
+            normalised.append(None)
+            errors.append(e)
+    return normalised, errors
+
+
 def is_uk_phone_number(number):
-    if number.startswith("0") and not number.startswith("00"):
+    if _has_uk_trunk_prefix(number):
         return True
 
-    number = normalise_phone_number(number)
+    return _is_normalised_uk_phone_number(normalise_phone_number(number))
 
-    if number.startswith(uk_prefix) or (number.startswith("7") and len(number) < 11):
-        return True
 
-    return False
+def _has_uk_trunk_prefix(number):
+    return number.startswith("0") and not number.startswith("00")
+
+
+def _is_normalised_uk_phone_number(number):
+    return number.startswith(uk_prefix) or (number.startswith("7") and len(number) < 11)
 
 
 international_phone_info = namedtuple(
@@ -98,7 +142,11 @@ def get_international_prefix(number):
 
 
 def validate_uk_phone_number(number):
-    number = normalise_phone_number(number).lstrip(uk_prefix).lstrip("0")
+    return _validate_normalised_uk_phone_number(normalise_phone_number(number))
+
+
+def _validate_normalised_uk_phone_number(number):
+    number = number.lstrip(uk_prefix).lstrip("0")
 
     if not number.startswith("7"):
         raise InvalidPhoneError("Not a UK mobile number")
@@ -113,10 +161,13 @@ def validate_uk_phone_number(number):
 
 
 def validate_phone_number(number, international=False):
-    if (not international) or is_uk_phone_number(number):
-        return validate_uk_phone_number(number)
+    # Every path normalises the number, raising the same error if it can't be, so only do it once
+    normalised = normalise_phone_number(number)
 
-    number = normalise_phone_number(number)
+    if (not international) or _has_uk_trunk_prefix(number) or _is_normalised_uk_phone_number(normalised):
+        return _validate_normalised_uk_phone_number(normalised)
+
+    number = normalised
 
     if len(number) < 8:
         raise InvalidPhoneError("Not enough digits")
@@ -146,12 +197,56 @@ def try_validate_and_format_phone_number(number, international=None, log_msg=Non
         return number
 
 
-def validate_email_address(email_address):  # noqa (C901 too complex)
+def validate_email_address(email_address):
     # almost exactly the same as by https://github.com/wtforms/wtforms/blob/master/wtforms/validators.py,
     # with minor tweaks for SES compatibility - to avoid complications we are a lot stricter with the local part
     # than neccessary - we don't allow any double quotes or semicolons to prevent SES Technical Failures
+    email_address, hostname = _split_email_address(email_address)
+
+    if not _is_valid_email_hostname(hostname):
+        raise InvalidEmailError
+
+    return email_address
+
+
+def validate_email_addresses(email_addresses):
+    """
+    Validates a list of email addresses, checking each distinct hostname only once. Returns a
+    list of the validated addresses and a list of the `InvalidEmailError` that
+    `validate_email_address` would have raised for each, with `None` in the other list
+    where there wasn't one.
+    """
+    split = []
+    for email_address in email_addresses:
+        try:
+            split.append(_split_email_address(email_address))
+        except InvalidEmailError as e:
+            split.append(e)
+
+    hostnames = {item[1] for item in split if isinstance(item, tuple)}
+    valid_hostnames = set(filter(_is_valid_email_hostname, hostnames))
+
+    validated, errors = [], []
+    for item in split:
+        if isinstance(item, InvalidEmailError):
+            validated.append(None)
+            errors.append(item)
+        elif item[1] in valid_hostnames:
+            validated.append(item[0])
+            errors.append(None)
+        else:
+            validated.append(None)
+            errors.append(InvalidEmailError())
+    return validated, errors
+
+
+def _split_email_address(email_address):
+    """
+    Does the checks on an email address which don't depend on its hostname, and returns
+    the stripped address and its hostname
+    """
     email_address = strip_and_remove_obscure_whitespace(email_address)
-    match = re.match(EMAIL_REGEX_PATTERN, email_address)
+    match = email_regex.match(email_address)
 
     # not an email
     if not match:
@@ -164,29 +259,30 @@ def validate_email_address(email_address):  # noqa (C901 too complex)
     if ".." in email_address:
         raise InvalidEmailError
 
-    hostname = match.group(1)
+    return email_address, match.group(1)
 
+
+# Most addresses share a handful of hostnames, so remember which ones have been checked
+@lru_cache(maxsize=1024)
+def _is_valid_email_hostname(hostname):
     # idna = "Internationalized domain name" - this encode/decode cycle converts unicode into its accurate ascii
     # representation as the web uses. '例え.テスト'.encode('idna') == b'xn--r8jz45g.xn--zckzah'
     try:
         hostname = hostname.encode("idna").decode("ascii")
     except UnicodeError:
-        raise InvalidEmailError
+        return False
 
     parts = hostname.split(".")
 
     if len(hostname) > 253 or len(parts) < 2:
-        raise InvalidEmailError
+        return False
 
     for part in parts:
         if not part or len(part) > 63 or not hostname_part.match(part):
-            raise InvalidEmailError
+            return False
 
     # if the part after the last . is not a valid TLD then bail out
-    if not tld_part.match(parts[-1]):
-        raise InvalidEmailError
-
-    return email_address
+    return bool(tld_part.match(parts[-1]))
 
 
 def format_email_address(email_address):
@@ -197,7 +293,6 @@ def validate_and_format_email_address(email_address):
     return format_email_address(validate_email_address(email_address))
 
 
-@lru_cache(maxsize=32, typed=False)
 def format_recipient(recipient):
     if not isinstance(recipient, str):
         return ""
@@ -208,6 +303,12 @@ def format_recipient(recipient):
     return recipient
 
 
+# `phonenumbers` formats UK mobile numbers in these ranges as `07xxx xxxxxx`, so they can be
+# formatted without it. Numbers starting 070 (personal numbers) and 076 (mostly pagers) are
+# grouped differently, so are left to `phonenumbers`.
+UK_MOBILE_NATIONAL_FORMAT_PREFIXES = tuple(f"{uk_prefix}7{digit}" for digit in "12345789")
+
+
 def format_phone_number_human_readable(phone_number):
     try:
         phone_number = validate_phone_number(phone_number, international=True)
@@ -215,14 +316,75 @@ def format_phone_number_human_readable(phone_number):
         # if there was a validation error, we want to shortcut out here, but still display the number on the front end
         return phone_number
 
+    if phone_number.startswith(UK_MOBILE_NATIONAL_FORMAT_PREFIXES):
+        return f"0{phone_number[2:6]} {phone_number[6:]}"
+
+    return _format_phone_number_national(phone_number)
+
+
+@lru_cache(maxsize=1024)
+def _format_phone_number_national(phone_number):
     return phonenumbers.format_number(
         phonenumbers.parse("+" + phone_number, None),
         (phonenumbers.PhoneNumberFormat.NATIONAL),
     )
 
 
+class RecipientAllowlist:
+    """
+    A set of recipients, formatted once with `format_recipient` when they're added, so that
+    checking whether a recipient is in it only has to format that recipient.
+
+    The same recipient can be added more than once in different formats (eg `07700900123`
+    and `+447700900123`), and stays in the allowlist until every one of them is removed.
+    """
+
+    def __init__(self, recipients=()):
+        self._counts = Counter()
+        self.update(recipients)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self)})"
+
+    def __contains__(self, recipient):
+        return format_recipient(recipient) in self._counts
+
+    def __iter__(self):
+        return iter(self._counts)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, recipient):
+        self._counts[format_recipient(recipient)] += 1
+
+    def update(self, recipients):
+        self._counts.update(format_recipient(recipient) for recipient in recipients)
+
+    def remove(self, recipient):
+        formatted = format_recipient(recipient)
+        if formatted not in self._counts:
+            raise KeyError(recipient)
+        self._counts[formatted] -= 1
+        if not self._counts[formatted]:
+            del self._counts[formatted]
+
+    def discard(self, recipient):
+        with suppress(KeyError):
+            self.remove(recipient)
+
+
+@lru_cache(maxsize=32)
+def _get_recipient_allowlist(recipients):
+    return RecipientAllowlist(recipients)
+
+
 def allowed_to_send_to(recipient, allowlist):
-    return format_recipient(recipient) in {format_recipient(x) for x in allowlist}
+    if not isinstance(allowlist, RecipientAllowlist):
+        # The same allowlist is usually checked against many recipients in a row, so it's
+        # only formatted the first time
+        allowlist = _get_recipient_allowlist(tuple(allowlist))
+    return recipient in allowlist
 
 
 def insert_or_append_to_dict(dict_, key, value):
@@ -238,3 +400,98 @@ def insert_or_append_to_dict(dict_, key, value):
             dict_[key] = [dict_[key], value]
     else:
         dict_.update({key: value})
+
+
+ValidationResult = namedtuple("ValidationResult", ["normalised", "error"])
+
+
+def _validate_chunk(validator, recipients):
+    results = []
+    for recipient in recipients:
+        try:
+            results.append(ValidationResult(validator(recipient), None))
+        except InvalidEmailError as e:
+            results.append(ValidationResult(None, e))
+    return results
+
+
+class BulkValidator:
+    """
+    Validates a stream of recipients across a pool of processes, for lists too long to
+    validate one at a time on a single core.
+
+    `validator` is any function which takes a recipient and either returns it normalised or
+    raises `InvalidEmailError` (or `InvalidPhoneError`/`InvalidAddressError`). It has to be
+    picklable, so use `functools.partial` rather than a lambda, eg
+
+        validator = BulkValidator(partial(validate_phone_number, international=True))
+        for normalised, error in validator.validate(recipients):
+            ...
+
+    Recipients are sent to the pool `chunk_size` at a time, with no more than
+    `max_pending_chunks` in flight, so the whole input is never held in memory. Results are
+    yielded in the same order as the input, with `error` set to the exception raised for
+    invalid recipients. Any other exception is raised from `validate`.
+    """
+
+    def __init__(self, validator, *, max_workers=None, chunk_size=1000, max_pending_chunks=None, executor=None):
+        self.validator = validator
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_pending_chunks = max_pending_chunks
+        self.executor = executor
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.validated_count = 0
+            self.error_count = 0
+            self.seconds = 0.0
+
+    @property
+    def per_second(self):
+        return self.validated_count / self.seconds if self.seconds else 0.0
+
+    def validate(self, recipients):
+        if self.executor:
+            yield from self._validate(self.executor, recipients)
+            return
+
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        try:
+            yield from self._validate(executor, recipients)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _validate(self, executor, recipients):
+        recipients = iter(recipients)
+        max_pending_chunks = self.max_pending_chunks or 2 * (self.max_workers or os.cpu_count() or 1)
+        pending = deque()
+        start = time.perf_counter()
+
+        try:
+            while True:
+                while len(pending) < max_pending_chunks:
+                    chunk = list(islice(recipients, self.chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_validate_chunk, self.validator, chunk))
+
+                if not pending:
+                    return
+
+                results = pending.popleft().result()
+                self._count(results, time.perf_counter() - start)
+                yield from results
+                # Don't count the time spent by whatever is consuming the results
+                start = time.perf_counter()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _count(self, results, seconds):
+        with self._lock:
+            self.validated_count += len(results)
+            self.error_count += sum(result.error is not None for result in results)
+            self.seconds += seconds
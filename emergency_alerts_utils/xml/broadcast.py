@@ -1,5 +1,10 @@
 import datetime
+import hashlib
 import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 
 import dateutil.tz
 
@@ -7,6 +12,7 @@ from emergency_alerts_utils.xml.cap import (
     generate_cap_alert,
     generate_cap_cancel_message,
     generate_cap_link_test,
+    write_cap_alert,
 )
 from emergency_alerts_utils.xml.common import (
     ALERT_MESSAGE_TYPE,
@@ -18,90 +24,279 @@ from emergency_alerts_utils.xml.common import (
     validate_channel,
     validate_message_format,
     validate_message_type,
+    write_etree,
 )
 from emergency_alerts_utils.xml.ibag import (
     format_ibag_signature,
     generate_ibag_alert,
     generate_ibag_cancel_message,
     generate_ibag_link_test,
+    write_ibag_alert,
 )
 
 logger = logging.getLogger("broadcast")
 
+XMLBody = namedtuple("XMLBody", ["body", "seconds"])
 
-def generate_xml_body(event, signing_enabled=False, signing_key=None, signing_certificate=None):  # noqa: C901
-    # C901: Too complex - but this method was migrated from CBC proxy as-is
 
-    identifier = event["identifier"]
+def generate_xml_body(event, signing_enabled=False, signing_key=None, signing_certificate=None, log_body=False):
+    """
+    Returns the XML body for an event. The length of the body in bytes and its SHA-256
+    digest are logged, and with `log_body` the body itself, at INFO.
+    """
+    message_format = validate_message_format(event["message_format"])
+
+    xml = _generate_xml(event, message_format)
+
+    if signing_enabled:
+        xml = _sign_xml(xml, message_format, signing_key, signing_certificate)
+
+    body = convert_etree_to_string(xml)
+    _log_xml_body(event["identifier"], body, log_body)
+    return body
 
+
+def write_xml_body(event, output, signing_enabled=False, signing_key=None, signing_certificate=None):
+    """
+    Writes the body `generate_xml_body` would return for an event to `output`, a file-like
+    object opened for writing bytes, as UTF-8.
+
+    The areas of an unsigned alert are streamed to `output` without building the whole
+    tree. A signature covers the whole document, so signed messages are built and signed as
+    usual, then written to `output` without converting them to a string first.
+    """
     message_format = validate_message_format(event["message_format"])
     message_type = validate_message_type(event["message_type"])
 
-    body = None
+    if logger.isEnabledFor(logging.INFO):
+        output = _DigestingWriter(output)
 
-    if message_type == TEST_MESSAGE_TYPE:
-        tz = dateutil.tz.gettz("UTC")
-        sent = datetime.datetime.now()
-        sent = sent.replace(second=0, microsecond=0, tzinfo=tz)
-        if message_format == IBAG_MESSAGE_FORMAT:
-            xml = generate_ibag_link_test(
-                message_number=event["message_number"],
-                identifier=identifier,
-                sent=sent,
-            )
-        else:
-            xml = generate_cap_link_test(
-                identifier=identifier,
-                sent=sent,
-            )
+    if message_type == ALERT_MESSAGE_TYPE and not signing_enabled:
+        _write_alert(event, message_format, output)
+    else:
+        xml = _generate_xml(event, message_format)
+        if signing_enabled:
+            xml = _sign_xml(xml, message_format, signing_key, signing_certificate)
+        write_etree(xml, output)
+
+    if isinstance(output, _DigestingWriter):
+        body_bytes, body_sha256 = output.length, output.sha256.hexdigest()
+        logger.info(
+            "Wrote body for %s: %d bytes, SHA-256 %s",
+            event["identifier"],
+            body_bytes,
+            body_sha256,
+            extra={"identifier": event["identifier"], "body_bytes": body_bytes, "body_sha256": body_sha256},
+        )
+
+
+class _DigestingWriter:
+    # Passes writes through to a file-like object, keeping count of the bytes written and a
+    # digest of them, so that a streamed body can be logged like one generated as a string
+    def __init__(self, output):
+        self.output = output
+        self.length = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.length += len(data)
+        self.sha256.update(data)
+        return self.output.write(data)
 
-    elif message_type == ALERT_MESSAGE_TYPE:
-        channel = validate_channel(event["channel"])
-        if message_format == IBAG_MESSAGE_FORMAT:
-            xml = generate_ibag_alert(
-                message_number=event["message_number"],
-                identifier=identifier,
-                headline=event["headline"],
-                description=event["description"],
-                areas=event["areas"],
-                sent=event["sent"],
-                expires=event["expires"],
-                language=event["language"],
-                channel=channel,
-            )
-        else:
-            xml = generate_cap_alert(
-                identifier=identifier,
-                headline=event["headline"],
-                description=event["description"],
-                areas=event["areas"],
-                sent=event["sent"],
-                expires=event["expires"],
-                language=event["language"],
-                channel=channel,
-                web=event.get("web"),
-                sender=event.get("sender"),
-                sender_name=event.get("sender_name"),
-            )
 
-    elif message_type == CANCEL_MESSAGE_TYPE:
+def generate_xml_bodies(event, providers, *, max_workers=None, executor=None, log_body=False):
+    """
+    Generates the body sent to each of several mobile network operators for one event,
+    signing them in parallel.
+
+    Each provider is a dict with a `message_format`, and a `message_number` for IBAG, which
+    override the ones in `event`. Bodies are signed if the provider has a `signing_key` (and
+    `signing_certificate`).
+
+    The XML is built once for each format and message number, and copied for each provider
+    that uses it. Signing happens across a pool of `max_workers` threads, or `executor` if
+    one is given.
+
+    Returns an `XMLBody(body, seconds)` for each provider, in the same order, where `seconds`
+    is how long it took to sign and serialise that provider's body. Each body is logged in
+    the same way as by `generate_xml_body`.
+    """
+    trees = {}
+    jobs = []
+    for provider in providers:
+        message_format = validate_message_format(provider["message_format"])
+        message_number = None
         if message_format == IBAG_MESSAGE_FORMAT:
-            xml = generate_ibag_cancel_message(
-                message_number=event["message_number"],
-                identifier=identifier,
-                references=event["references"],
-                sent=event["sent"],
+            message_number = provider.get("message_number", event.get("message_number"))
+        if (message_format, message_number) not in trees:
+            trees[(message_format, message_number)] = _generate_xml(
+                event | {"message_format": message_format, "message_number": message_number}, message_format
             )
-        else:
-            xml = generate_cap_cancel_message(
-                identifier=identifier, references=event["references"], sent=event["sent"], sender=event.get("sender")
+        # Each body gets its own copy, so that no two threads use the same tree
+        jobs.append(
+            (
+                deepcopy(trees[(message_format, message_number)]),
+                message_format,
+                provider.get("signing_key"),
+                provider.get("signing_certificate"),
+                event["identifier"],
+                log_body,
             )
+        )
 
-    if signing_enabled:
-        xml = digitally_sign(xml, key=signing_key, cert=signing_certificate)
-        if message_format == IBAG_MESSAGE_FORMAT:
-            xml = format_ibag_signature(xml)
+    if executor:
+        return _generate_xml_bodies_from_xml(executor, jobs)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return _generate_xml_bodies_from_xml(executor, jobs)
+
+
+def _generate_xml_bodies_from_xml(executor, jobs):
+    futures = [executor.submit(_generate_xml_body_from_xml, *job) for job in jobs]
+    return [future.result() for future in futures]
+
+
+def _generate_xml_body_from_xml(xml, message_format, signing_key, signing_certificate, identifier, log_body):
+    start = time.perf_counter()
+
+    if signing_key:
+        xml = _sign_xml(xml, message_format, signing_key, signing_certificate)
 
     body = convert_etree_to_string(xml)
-    logger.info("Body: " + body)
-    return body
+    seconds = time.perf_counter() - start
+    _log_xml_body(identifier, body, log_body)
+    return XMLBody(body, seconds)
+
+
+def _log_xml_body(identifier, body, log_body):
+    # A body with a lot of polygons can be hundreds of kilobytes, so only the digest is
+    # logged unless asked for, and nothing is worked out if it's not going to be logged
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    # Logged in bytes, as `write_xml_body` does, so the two can be compared
+    encoded_body = body.encode("utf-8")
+    body_bytes = len(encoded_body)
+    body_sha256 = hashlib.sha256(encoded_body).hexdigest()
+    logger.info(
+        "Generated body for %s: %d bytes, SHA-256 %s",
+        identifier,
+        body_bytes,
+        body_sha256,
+        extra={"identifier": identifier, "body_bytes": body_bytes, "body_sha256": body_sha256},
+    )
+    if log_body:
+        logger.info("Body: %s", body, extra={"identifier": identifier})
+
+
+def _sign_xml(xml, message_format, signing_key, signing_certificate):
+    xml = digitally_sign(xml, key=signing_key, cert=signing_certificate)
+    if message_format == IBAG_MESSAGE_FORMAT:
+        xml = format_ibag_signature(xml)
+    return xml
+
+
+def _generate_xml(event, message_format):
+    message_type = validate_message_type(event["message_type"])
+
+    if message_type == TEST_MESSAGE_TYPE:
+        return _generate_link_test(event, message_format)
+    if message_type == ALERT_MESSAGE_TYPE:
+        return _generate_alert(event, message_format)
+    if message_type == CANCEL_MESSAGE_TYPE:
+        return _generate_cancel_message(event, message_format)
+
+    raise ValueError(f"Can't generate XML for a message of type '{message_type}'")
+
+
+def _generate_link_test(event, message_format):
+    tz = dateutil.tz.gettz("UTC")
+    sent = datetime.datetime.now()
+    sent = sent.replace(second=0, microsecond=0, tzinfo=tz)
+    if message_format == IBAG_MESSAGE_FORMAT:
+        return generate_ibag_link_test(
+            message_number=event["message_number"],
+            identifier=event["identifier"],
+            sent=sent,
+        )
+    return generate_cap_link_test(
+        identifier=event["identifier"],
+        sent=sent,
+    )
+
+
+def _generate_alert(event, message_format):
+    channel = validate_channel(event["channel"])
+    if message_format == IBAG_MESSAGE_FORMAT:
+        return generate_ibag_alert(
+            message_number=event["message_number"],
+            identifier=event["identifier"],
+            headline=event["headline"],
+            description=event["description"],
+            areas=event["areas"],
+            sent=event["sent"],
+            expires=event["expires"],
+            language=event["language"],
+            channel=channel,
+        )
+    return generate_cap_alert(
+        identifier=event["identifier"],
+        headline=event["headline"],
+        description=event["description"],
+        areas=event["areas"],
+        sent=event["sent"],
+        expires=event["expires"],
+        language=event["language"],
+        channel=channel,
+        web=event.get("web"),
+        sender=event.get("sender"),
+        sender_name=event.get("sender_name"),
+    )
+
+
+def _write_alert(event, message_format, output):
+    channel = validate_channel(event["channel"])
+    if message_format == IBAG_MESSAGE_FORMAT:
+        write_ibag_alert(
+            output,
+            message_number=event["message_number"],
+            identifier=event["identifier"],
+            headline=event["headline"],
+            description=event["description"],
+            areas=event["areas"],
+            sent=event["sent"],
+            expires=event["expires"],
+            language=event["language"],
+            channel=channel,
+        )
+    else:
+        write_cap_alert(
+            output,
+            identifier=event["identifier"],
+            headline=event["headline"],
+            description=event["description"],
+            areas=event["areas"],
+            sent=event["sent"],
+            expires=event["expires"],
+            language=event["language"],
+            channel=channel,
+            web=event.get("web"),
+            sender=event.get("sender"),
+            sender_name=event.get("sender_name"),
+        )
+
+
+def _generate_cancel_message(event, message_format):
+    if message_format == IBAG_MESSAGE_FORMAT:
+        return generate_ibag_cancel_message(
+            message_number=event["message_number"],
+            identifier=event["identifier"],
+            references=event["references"],
+            sent=event["sent"],
+        )
+    return generate_cap_cancel_message(
+        identifier=event["identifier"],
+        references=event["references"],
+        sent=event["sent"],
+        sender=event.get("sender"),
+    )
@@ -1,5 +1,8 @@
 # We use lxml in place of native xml to support consistent encoding/decoding,
 # handling of namespaces and for securely parsing untrusted XML
+from copy import deepcopy
+from functools import lru_cache, partial
+
 from lxml import etree as ET
 
 from emergency_alerts_utils.xml.common import (
@@ -7,24 +10,40 @@ from emergency_alerts_utils.xml.common import (
     OPERATOR_CHANNEL,
     SENDER,
     SEVERE_CHANNEL,
+    get_elements_by_tag,
+    write_etree,
+    write_polygon,
     xml_subelement,
 )
 
+# Each message is generated by deep copying a skeleton with every element that's the same in
+# every message of that type already in place, then filling in the rest. The skeletons are
+# built by the same calls as before, with `None` where the variable text goes, so the XML
+# is identical to building the whole tree each time.
 
-def generate_cap_link_test(
-    identifier,
-    sent,
-):
-    alert = ET.Element(
+CAP_EVENTS = {
+    OPERATOR_CHANNEL: "OPR",
+    SEVERE_CHANNEL: "Alert",
+    GOVERNMENT_CHANNEL: "EAN",
+}
+
+
+def _generate_cap_root():
+    return ET.Element(
         "alert",
         attrib={
             "xmlns": "urn:oasis:names:tc:emergency:cap:1.2",
         },
     )
 
-    xml_subelement(alert, "identifier", text=identifier)
+
+@lru_cache(maxsize=None)
+def _get_cap_link_test_skeleton():
+    alert = _generate_cap_root()
+
+    xml_subelement(alert, "identifier")
     xml_subelement(alert, "sender", text=SENDER)
-    xml_subelement(alert, "sent", text=sent.astimezone().isoformat())
+    xml_subelement(alert, "sent")
     xml_subelement(alert, "status", text="Test")
     xml_subelement(alert, "msgType", text="Alert")
     xml_subelement(alert, "scope", text="Public")
@@ -32,42 +51,61 @@ def generate_cap_link_test(
     return alert
 
 
-def generate_cap_alert(
-    identifier, headline, description, areas, sent, expires, language, channel, web=None, sender=None, sender_name=None
+def generate_cap_link_test(
+    identifier,
+    sent,
 ):
-    alert = ET.Element(
-        "alert",
-        attrib={
-            "xmlns": "urn:oasis:names:tc:emergency:cap:1.2",
-        },
-    )
+    alert = deepcopy(_get_cap_link_test_skeleton())
+    elements = get_elements_by_tag(alert)
+
+    elements["identifier"].text = identifier
+    elements["sent"].text = sent.astimezone().isoformat()
+
+    return alert
 
-    xml_subelement(alert, "identifier", text=identifier)
-    xml_subelement(alert, "sender", text=sender or SENDER)
-    xml_subelement(alert, "sent", text=sent)
+
+@lru_cache(maxsize=None)
+def _get_cap_alert_skeleton(cap_event):
+    alert = _generate_cap_root()
+
+    xml_subelement(alert, "identifier")
+    xml_subelement(alert, "sender")
+    xml_subelement(alert, "sent")
     xml_subelement(alert, "status", text="Actual")
     xml_subelement(alert, "msgType", text="Alert")
     xml_subelement(alert, "scope", text="Public")
 
     info = xml_subelement(alert, "info")
 
-    xml_subelement(info, "language", text=language)
+    xml_subelement(info, "language")
     xml_subelement(info, "category", text="Safety")
-    cap_event = "RMT"
-    if channel == OPERATOR_CHANNEL:
-        cap_event = "OPR"
-    if channel == SEVERE_CHANNEL:
-        cap_event = "Alert"
-    elif channel == GOVERNMENT_CHANNEL:
-        cap_event = "EAN"
     xml_subelement(info, "event", text=cap_event)
     xml_subelement(info, "urgency", text="Expected")
     xml_subelement(info, "severity", text="Severe")
     xml_subelement(info, "certainty", text="Likely")
-    xml_subelement(info, "expires", text=expires)
-    xml_subelement(info, "senderName", text=sender_name or "GOV.UK Emergency Alerts")
-    xml_subelement(info, "headline", text=headline)
-    xml_subelement(info, "description", text=description)
+    xml_subelement(info, "expires")
+    xml_subelement(info, "senderName")
+    xml_subelement(info, "headline")
+    xml_subelement(info, "description")
+
+    return alert
+
+
+def generate_cap_alert(
+    identifier, headline, description, areas, sent, expires, language, channel, web=None, sender=None, sender_name=None
+):
+    alert = deepcopy(_get_cap_alert_skeleton(CAP_EVENTS.get(channel, "RMT")))
+    elements = get_elements_by_tag(alert)
+    info = elements["info"]
+
+    elements["identifier"].text = identifier
+    elements["sender"].text = sender or SENDER
+    elements["sent"].text = sent
+    elements["language"].text = language
+    elements["expires"].text = expires
+    elements["senderName"].text = sender_name or "GOV.UK Emergency Alerts"
+    elements["headline"].text = headline
+    elements["description"].text = description
 
     if web:
         xml_subelement(info, "web", text=web)
@@ -91,24 +129,68 @@ def generate_cap_alert(
     return alert
 
 
-def generate_cap_cancel_message(identifier, sent, references, sender=None):
-    alert = ET.Element(
-        "alert",
-        attrib={
-            "xmlns": "urn:oasis:names:tc:emergency:cap:1.2",
-        },
+def write_cap_alert(
+    output,
+    identifier,
+    headline,
+    description,
+    areas,
+    sent,
+    expires,
+    language,
+    channel,
+    web=None,
+    sender=None,
+    sender_name=None,
+):
+    """
+    Writes the alert `generate_cap_alert` would generate to `output`, a file-like object
+    opened for writing bytes, as UTF-8. The areas are streamed to `output` as they're
+    formatted, rather than built as a tree first, so alerts with a lot of detailed polygons
+    only ever hold a little of their text in memory.
+    """
+    alert = generate_cap_alert(
+        identifier, headline, description, [], sent, expires, language, channel, web, sender, sender_name
     )
+    write_etree(alert, output, extra_children={"info": partial(_write_cap_areas, areas=areas)})
 
-    references_list = [f"{sender or SENDER},{ref['message_id']},{ref['sent']}" for ref in references]
-    references_string = " ".join(references_list)
 
-    xml_subelement(alert, "identifier", text=identifier)
-    xml_subelement(alert, "sender", text=sender or SENDER)
-    xml_subelement(alert, "sent", text=sent)
+def _write_cap_areas(xf, areas):
+    for i, a in enumerate(areas):
+        with xf.element("area"):
+            with xf.element("areaDesc"):
+                xf.write(a.get("description", "area-{}".format(i + 1)))
+
+            for polygon in a.get("polygons") or [a["polygon"]]:
+                write_polygon(xf, "polygon", polygon)
+
+
+@lru_cache(maxsize=None)
+def _get_cap_cancel_message_skeleton():
+    alert = _generate_cap_root()
+
+    xml_subelement(alert, "identifier")
+    xml_subelement(alert, "sender")
+    xml_subelement(alert, "sent")
     xml_subelement(alert, "status", text="Actual")
     xml_subelement(alert, "msgType", text="Cancel")
     xml_subelement(alert, "scope", text="Public")
-    xml_subelement(alert, "references", text=references_string)
+    xml_subelement(alert, "references")
+
+    return alert
+
+
+def generate_cap_cancel_message(identifier, sent, references, sender=None):
+    alert = deepcopy(_get_cap_cancel_message_skeleton())
+    elements = get_elements_by_tag(alert)
+
+    references_list = [f"{sender or SENDER},{ref['message_id']},{ref['sent']}" for ref in references]
+    references_string = " ".join(references_list)
+
+    elements["identifier"].text = identifier
+    elements["sender"].text = sender or SENDER
+    elements["sent"].text = sent
+    elements["references"].text = references_string
 
     return alert
 
@@ -1,7 +1,24 @@
 # Shared utilties and constants between CAP and IBAG broadcast formats
 
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
 from lxml import etree as ET
-from signxml import XMLSigner
+from signxml import (
+    DigestAlgorithm,
+    SignatureConfiguration,
+    SignatureMethod,
+    XMLSigner,
+    XMLVerifier,
+)
+from signxml.exceptions import SignXMLException
+from signxml.util import X509CertChainVerifier, iterate_pem
 
 ALERT_MESSAGE_TYPE = "Alert"
 UPDATE_MESSAGE_TYPE = "Update"
@@ -27,6 +44,60 @@ SENDER = "broadcasts@notifications.service.gov.uk"
 
 HEADLINE = "GOV.UK Emergency Alert"
 
+# How many pairs of coordinates are formatted at a time when streaming a polygon
+POLYGON_CHUNK_SIZE = 100
+
+
+class DocumentSigner:
+    """
+    Signs XML with one key and certificate. Loading an RSA key takes far longer than signing
+    with it, so the key and certificate are parsed once, when this is created, rather than
+    for every message. Can be shared between threads.
+    """
+
+    def __init__(self, key, cert):
+        if isinstance(key, str):
+            key = key.encode()
+        if isinstance(key, bytes):
+            key = load_pem_private_key(key, password=None)
+        self.key = key
+        # Kept as PEM so that the certificates in the signature are exactly as they were given
+        if isinstance(cert, (str, bytes)):
+            cert = list(iterate_pem(cert))
+        elif cert is not None:
+            cert = list(cert)
+        self.cert_chain = cert
+        # An `XMLSigner` creates its parser the first time it's used, and lxml parsers can't
+        # be used by more than one thread at once, so each thread gets its own
+        self._local = threading.local()
+
+    def _get_xml_signer(self):
+        if not hasattr(self._local, "xml_signer"):
+            self._local.xml_signer = XMLSigner(
+                signature_algorithm="rsa-sha256",
+                digest_algorithm="sha256",
+                c14n_algorithm="http://www.w3.org/2006/12/xml-c14n11",
+            )
+        return self._local.xml_signer
+
+    def sign(self, xml):
+        """
+        Given an xml etree, envelopes a Signature block to the root element, that consists of a digital signature
+        based on https://www.ietf.org/rfc/rfc4051.txt. Canonicalizes the element using xml-c14n11, and then signs
+        that, then returns the xml etree with that signature in place.
+        """
+        return self._get_xml_signer().sign(xml, key=self.key, cert=self.cert_chain)
+
+
+@lru_cache(maxsize=16)
+def get_signer(key, cert):
+    """
+    Returns a `DocumentSigner` for a key and certificate, given as PEM, reusing the one from
+    the last time they were used. Both have to be hashable, so a chain of certificates has to
+    be a tuple.
+    """
+    return DocumentSigner(key, cert)
+
 
 def digitally_sign(xml, key, cert):
     """
@@ -34,13 +105,126 @@ def digitally_sign(xml, key, cert):
     https://www.ietf.org/rfc/rfc4051.txt. Canonicalizes the element using xml-c14n11, and then signs that, then returns
     the xml etree with that signature in place.
     """
-    signed_root = XMLSigner(
-        signature_algorithm="rsa-sha256",
-        digest_algorithm="sha256",
-        c14n_algorithm="http://www.w3.org/2006/12/xml-c14n11",
-    ).sign(xml, key=key, cert=cert)
+    if isinstance(cert, list):
+        cert = tuple(cert)
+    return get_signer(key, cert).sign(xml)
+
+
+VerificationResult = namedtuple("VerificationResult", ["verify_result", "error", "seconds"])
+
+
+# These override signxml internals as they are in 5.1, which setup.py pins it to. Check them
+# against its `XMLVerifier.get_cert_chain_verifier` before allowing a newer version.
+class _CertChainVerifier(X509CertChainVerifier):
+    # signxml reads and parses the CA file every time it verifies a chain, so use a store
+    # of the certificates in it loaded once instead
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store
+
+
+class _XMLVerifier(XMLVerifier):
+    def __init__(self, store):
+        super().__init__()
+        self._store = store
+
+    def get_cert_chain_verifier(self, ca_pem_file, ee_policy, ca_policy):
+        return _CertChainVerifier(
+            self._store,
+            verification_time=self._get_cert_verification_time(),
+            ee_policy=ee_policy,
+            ca_policy=ca_policy,
+        )
+
+
+class DocumentVerifier:
+    """
+    Verifies the signatures of XML signed as `digitally_sign` signs it. The counterpart of
+    `DocumentSigner`.
+
+    Signatures are checked against `cert`, as PEM, if given. Otherwise the certificates in
+    the signature have to chain to one in `ca_pem_file`, which defaults to the bundle signxml
+    uses. Either way the certificates are parsed once, when this is created, rather than for
+    every document. Only RSA-SHA256 signatures of SHA-256 digests are accepted, unless
+    `expect_config` (a `signxml.SignatureConfiguration`) says otherwise.
+
+    Can be shared between threads.
+    """
+
+    def __init__(self, cert=None, *, ca_pem_file=None, expect_config=None):
+        if isinstance(cert, str):
+            cert = cert.encode()
+        self.cert = x509.load_pem_x509_certificate(cert) if isinstance(cert, bytes) else cert
+        self.store = None if self.cert else X509CertChainVerifier(ca_pem_file=ca_pem_file).store
+        self.expect_config = expect_config or SignatureConfiguration(
+            signature_methods=frozenset({SignatureMethod.RSA_SHA256}),
+            digest_algorithms=frozenset({DigestAlgorithm.SHA256}),
+        )
+        # An `XMLVerifier` keeps the details of the document it's verifying on itself, so
+        # each thread gets its own
+        self._local = threading.local()
+
+    def _get_xml_verifier(self):
+        if not hasattr(self._local, "xml_verifier"):
+            self._local.xml_verifier = _XMLVerifier(self.store)
+        return self._local.xml_verifier
+
+    def verify(self, xml):
+        """
+        Verifies the signature of an xml etree, string or bytes, returning a
+        `signxml.VerifyResult` or raising `signxml.exceptions.InvalidSignature` (or
+        `InvalidInput`). Only use the `signed_xml` of the result, which is what was signed.
+        """
+        return self._get_xml_verifier().verify(xml, x509_cert=self.cert, expect_config=self.expect_config)
+
+    def verify_all(self, documents, *, max_workers=None, executor=None):
+        """
+        Verifies the signatures of a list of documents across a pool of `max_workers`
+        threads, or `executor` if one is given.
+
+        Returns a `VerificationResult(verify_result, error, seconds)` for each document, in
+        the same order, where `error` is the exception raised if it didn't verify (or the
+        document couldn't be parsed) and `seconds` is how long verifying it took.
+        """
+        if executor:
+            return self._verify_all(executor, documents)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return self._verify_all(executor, documents)
+
+    def _verify_all(self, executor, documents):
+        futures = [executor.submit(self._verify_and_time, document) for document in documents]
+        return [future.result() for future in futures]
+
+    def _verify_and_time(self, document):
+        start = time.perf_counter()
+        try:
+            verify_result, error = self.verify(document), None
+        except (SignXMLException, ET.XMLSyntaxError) as e:
+            verify_result, error = None, e
+        return VerificationResult(verify_result, error, time.perf_counter() - start)
+
+
+@lru_cache(maxsize=16)
+def get_verifier(cert=None, ca_pem_file=None):
+    """
+    Returns a `DocumentVerifier` for a certificate, as PEM, or CA file, reusing the one from
+    the last time they were used
+    """
+    return DocumentVerifier(cert, ca_pem_file=ca_pem_file)
 
-    return signed_root
+
+def verify_signature(xml, cert):
+    """
+    Verifies the signature of an xml etree, string or bytes signed by `digitally_sign` with
+    the key for `cert`, and returns the xml etree that was signed. Raises
+    `signxml.exceptions.InvalidSignature` if it doesn't verify.
+    """
+    return get_verifier(cert).verify(xml).signed_xml
 
 
 def xml_subelement(elem, name, attrib=None, text=None):
@@ -55,6 +239,14 @@ def xml_subelement(elem, name, attrib=None, text=None):
     return sub
 
 
+def get_elements_by_tag(xml):
+    """
+    Returns a dict of every element in the tree by its tag, for trees where each tag is
+    only used once
+    """
+    return {element.tag: element for element in xml.iter()}
+
+
 def convert_etree_to_string(xml):
     """
     Currently doesn't canonicalise it, as we believe this may be causing issues with line breaks in the description
@@ -63,6 +255,46 @@ def convert_etree_to_string(xml):
     return ET.tostring(xml, encoding="unicode")
 
 
+def write_etree(xml, output, extra_children=None):
+    """
+    Writes an xml etree to `output`, a file-like object opened for writing bytes. What's
+    written is the same as `convert_etree_to_string(xml).encode("utf-8")`.
+
+    `extra_children` maps tags to functions which are called with the `ET.xmlfile` being
+    written to, to stream more children into the element with that tag after the ones it
+    already has.
+    """
+    with ET.xmlfile(output, encoding="utf-8") as xf:
+        _write_element(xf, xml, extra_children or {})
+
+
+def _write_element(xf, element, extra_children):
+    if not any(descendant.tag in extra_children for descendant in element.iter()):
+        xf.write(element)
+        return
+
+    with xf.element(element.tag, dict(element.attrib)):
+        if element.text:
+            xf.write(element.text)
+        for child in element:
+            _write_element(xf, child, extra_children)
+        if element.tag in extra_children:
+            extra_children[element.tag](xf)
+
+
+def write_polygon(xf, tag, polygon):
+    """
+    Writes an element with the text `"lat,lon lat,lon ..."` for an iterable of pairs to an
+    `ET.xmlfile`, formatting `POLYGON_CHUNK_SIZE` pairs at a time rather than all of them
+    """
+    pairs = iter(polygon)
+    with xf.element(tag):
+        separator = ""
+        while chunk := list(islice(pairs, POLYGON_CHUNK_SIZE)):
+            xf.write(separator + " ".join(["{},{}".format(pair[0], pair[1]) for pair in chunk]))
+            separator = " "
+
+
 def validate_message_format(message_format):
     """validates the message format to be sent to the CBC"""
 
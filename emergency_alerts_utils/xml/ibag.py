@@ -1,3 +1,6 @@
+from copy import deepcopy
+from functools import lru_cache, partial
+
 from lxml import etree as ET
 
 from emergency_alerts_utils.xml.common import (
@@ -5,26 +8,39 @@ from emergency_alerts_utils.xml.common import (
     OPERATOR_CHANNEL,
     SENDER,
     SEVERE_CHANNEL,
+    get_elements_by_tag,
+    write_etree,
+    write_polygon,
     xml_subelement,
 )
 
+# As in `cap.py`, each message is generated by deep copying a skeleton with the elements
+# which are the same in every message of that type already in place.
 
-def generate_ibag_link_test(
-    message_number,
-    identifier,
-    sent,
-):
-    alert = ET.Element(
+IBAG_CHANNEL_CATEGORIES = {
+    OPERATOR_CHANNEL: "4382-CAT7-ENGLISH",
+    SEVERE_CHANNEL: "4378-CAT3-ENGLISH",
+    GOVERNMENT_CHANNEL: "4370-CAT1-ENGLISH",
+}
+
+
+def _generate_ibag_root():
+    return ET.Element(
         "IBAG_Alert_Attributes",
         attrib={
             "xmlns": "ibag:1.0",
         },
     )
 
+
+@lru_cache(maxsize=None)
+def _get_ibag_link_test_skeleton():
+    alert = _generate_ibag_root()
+
     xml_subelement(alert, "IBAG_protocol_version", text="1.0")
     xml_subelement(alert, "IBAG_sending_gateway_id", text=SENDER)
-    xml_subelement(alert, "IBAG_message_number", text=message_number)
-    xml_subelement(alert, "IBAG_sent_date_time", text=sent.astimezone().isoformat())
+    xml_subelement(alert, "IBAG_message_number")
+    xml_subelement(alert, "IBAG_sent_date_time")
     xml_subelement(alert, "IBAG_status", text="System")
     xml_subelement(alert, "IBAG_message_type", text="Link Test")
     xml_subelement(alert, "IBAG_Digital_Signature", text="")
@@ -32,34 +48,34 @@ def generate_ibag_link_test(
     return alert
 
 
-def generate_ibag_alert(
+def generate_ibag_link_test(
     message_number,
     identifier,
-    headline,
-    description,
-    areas,
     sent,
-    expires,
-    language,
-    channel,
 ):
-    alert = ET.Element(
-        "IBAG_Alert_Attributes",
-        attrib={
-            "xmlns": "ibag:1.0",
-        },
-    )
+    alert = deepcopy(_get_ibag_link_test_skeleton())
+    elements = get_elements_by_tag(alert)
+
+    elements["IBAG_message_number"].text = message_number
+    elements["IBAG_sent_date_time"].text = sent.astimezone().isoformat()
+
+    return alert
+
+
+@lru_cache(maxsize=None)
+def _get_ibag_alert_skeleton(channel_category):
+    alert = _generate_ibag_root()
 
     xml_subelement(alert, "IBAG_protocol_version", text="1.0")
     xml_subelement(alert, "IBAG_sending_gateway_id", text=SENDER)
-    xml_subelement(alert, "IBAG_message_number", text=message_number)
+    xml_subelement(alert, "IBAG_message_number")
     xml_subelement(alert, "IBAG_sender", text=SENDER)
-    xml_subelement(alert, "IBAG_sent_date_time", text=sent)
+    xml_subelement(alert, "IBAG_sent_date_time")
     xml_subelement(alert, "IBAG_status", text="Actual")
     xml_subelement(alert, "IBAG_message_type", text="Alert")
     xml_subelement(alert, "IBAG_cap_alert_uri", text="https://www.gov.uk/alerts")
-    xml_subelement(alert, "IBAG_cap_identifier", text=identifier)
-    xml_subelement(alert, "IBAG_cap_sent_date_time", text=sent)
+    xml_subelement(alert, "IBAG_cap_identifier")
+    xml_subelement(alert, "IBAG_cap_sent_date_time")
 
     info = xml_subelement(alert, "IBAG_alert_info")
 
@@ -68,23 +84,41 @@ def generate_ibag_alert(
     xml_subelement(info, "IBAG_severity", text="Severe")
     xml_subelement(info, "IBAG_urgency", text="Expected")
     xml_subelement(info, "IBAG_certainty", text="Likely")
-    xml_subelement(info, "IBAG_expires_date_time", text=expires)
-    xml_subelement(info, "IBAG_text_language", text=language)
+    xml_subelement(info, "IBAG_expires_date_time")
+    xml_subelement(info, "IBAG_text_language")
+    xml_subelement(info, "IBAG_text_alert_message_length")
+    xml_subelement(info, "IBAG_text_alert_message")
+    xml_subelement(info, "IBAG_channel_category", text=channel_category)
+
+    xml_subelement(alert, "IBAG_Digital_Signature", text="")
+
+    return alert
+
+
+def generate_ibag_alert(
+    message_number,
+    identifier,
+    headline,
+    description,
+    areas,
+    sent,
+    expires,
+    language,
+    channel,
+):
+    alert = deepcopy(_get_ibag_alert_skeleton(IBAG_CHANNEL_CATEGORIES.get(channel, "4380-CAT5-ENGLISH")))
+    elements = get_elements_by_tag(alert)
+    info = elements["IBAG_alert_info"]
+
+    elements["IBAG_message_number"].text = message_number
+    elements["IBAG_sent_date_time"].text = sent
+    elements["IBAG_cap_identifier"].text = identifier
+    elements["IBAG_cap_sent_date_time"].text = sent
+    elements["IBAG_expires_date_time"].text = expires
+    elements["IBAG_text_language"].text = language
     # length in octets/bytes
-    xml_subelement(
-        info,
-        "IBAG_text_alert_message_length",
-        text=str(len(description.encode("utf-8"))),
-    )
-    xml_subelement(info, "IBAG_text_alert_message", text=description)
-    IBAG_channel_category = "4380-CAT5-ENGLISH"
-    if channel == OPERATOR_CHANNEL:
-        IBAG_channel_category = "4382-CAT7-ENGLISH"
-    if channel == SEVERE_CHANNEL:
-        IBAG_channel_category = "4378-CAT3-ENGLISH"
-    elif channel == GOVERNMENT_CHANNEL:
-        IBAG_channel_category = "4370-CAT1-ENGLISH"
-    xml_subelement(info, "IBAG_channel_category", text=IBAG_channel_category)
+    elements["IBAG_text_alert_message_length"].text = str(len(description.encode("utf-8")))
+    elements["IBAG_text_alert_message"].text = description
 
     for i, a in enumerate(areas):
         area = xml_subelement(info, "IBAG_Alert_Area")
@@ -99,41 +133,79 @@ def generate_ibag_alert(
         for geocode in a.get("geocodes", []):
             xml_subelement(area, "IBAG_geocode", text=geocode)
 
-    xml_subelement(alert, "IBAG_Digital_Signature", text="")
-
     return alert
 
 
-def generate_ibag_cancel_message(message_number, identifier, references, sent):
-    alert = ET.Element(
-        "IBAG_Alert_Attributes",
-        attrib={
-            "xmlns": "ibag:1.0",
-        },
-    )
+def write_ibag_alert(
+    output,
+    message_number,
+    identifier,
+    headline,
+    description,
+    areas,
+    sent,
+    expires,
+    language,
+    channel,
+):
+    """
+    Writes the alert `generate_ibag_alert` would generate to `output`, a file-like object
+    opened for writing bytes, as UTF-8, streaming the areas as `write_cap_alert` does
+    """
+    alert = generate_ibag_alert(message_number, identifier, headline, description, [], sent, expires, language, channel)
+    write_etree(alert, output, extra_children={"IBAG_alert_info": partial(_write_ibag_areas, areas=areas)})
+
+
+def _write_ibag_areas(xf, areas):
+    for i, a in enumerate(areas):
+        with xf.element("IBAG_Alert_Area"):
+            with xf.element("IBAG_area_description"):
+                xf.write("area-{}".format(i + 1))
+
+            if polygon := a.get("polygon", []):
+                write_polygon(xf, "IBAG_polygon", polygon)
+
+            for geocode in a.get("geocodes", []):
+                with xf.element("IBAG_geocode"):
+                    xf.write(geocode)
+
+
+@lru_cache(maxsize=None)
+def _get_ibag_cancel_message_skeleton():
+    alert = _generate_ibag_root()
 
     xml_subelement(alert, "IBAG_protocol_version", text="1.0")
     xml_subelement(alert, "IBAG_sending_gateway_id", text=SENDER)
-    xml_subelement(alert, "IBAG_message_number", text=message_number)
-    # reference last message in the series
-    xml_subelement(alert, "IBAG_referenced_message_number", text=references[-1]["message_number"])
-    xml_subelement(
-        alert,
-        "IBAG_referenced_message_cap_identifier",
-        text=references[-1]["message_id"],
-    )
+    xml_subelement(alert, "IBAG_message_number")
+    xml_subelement(alert, "IBAG_referenced_message_number")
+    xml_subelement(alert, "IBAG_referenced_message_cap_identifier")
     xml_subelement(alert, "IBAG_sender", text=SENDER)
-    xml_subelement(alert, "IBAG_sent_date_time", text=sent)
+    xml_subelement(alert, "IBAG_sent_date_time")
     xml_subelement(alert, "IBAG_status", text="Actual")
     xml_subelement(alert, "IBAG_message_type", text="Cancel")
     xml_subelement(alert, "IBAG_cap_alert_uri", text="https://www.gov.uk/alerts")
-    xml_subelement(alert, "IBAG_cap_identifier", text=identifier)
-    xml_subelement(alert, "IBAG_cap_sent_date_time", text=sent)
+    xml_subelement(alert, "IBAG_cap_identifier")
+    xml_subelement(alert, "IBAG_cap_sent_date_time")
     xml_subelement(alert, "IBAG_Digital_Signature", text="")
 
     return alert
 
 
+def generate_ibag_cancel_message(message_number, identifier, references, sent):
+    alert = deepcopy(_get_ibag_cancel_message_skeleton())
+    elements = get_elements_by_tag(alert)
+
+    elements["IBAG_message_number"].text = message_number
+    # reference last message in the series
+    elements["IBAG_referenced_message_number"].text = references[-1]["message_number"]
+    elements["IBAG_referenced_message_cap_identifier"].text = references[-1]["message_id"]
+    elements["IBAG_sent_date_time"].text = sent
+    elements["IBAG_cap_identifier"].text = identifier
+    elements["IBAG_cap_sent_date_time"].text = sent
+
+    return alert
+
+
 def format_ibag_signature(xml):
     """
     IBAG message signature needs to be enveloped in a <IBAG_Digital_Signature> child element rather than the root
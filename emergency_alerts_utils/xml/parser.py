@@ -0,0 +1,246 @@
+"""
+Parses CAP and IBAG documents, like the ones generated by `generate_xml_body`, back into
+the event it takes.
+
+Documents may come from outside, so are parsed without resolving entities, loading DTDs
+or touching the network, and any document with a DOCTYPE is rejected.
+"""
+
+import threading
+
+from lxml import etree as ET
+
+from emergency_alerts_utils.xml.cap import CAP_EVENTS
+from emergency_alerts_utils.xml.common import TEST_CHANNEL
+from emergency_alerts_utils.xml.ibag import IBAG_CHANNEL_CATEGORIES
+
+CAP_NAMESPACE = "urn:oasis:names:tc:emergency:cap:1.2"
+IBAG_NAMESPACE = "ibag:1.0"
+
+PARSER_OPTIONS = {
+    "resolve_entities": False,
+    "no_network": True,
+    "load_dtd": False,
+    "dtd_validation": False,
+    "huge_tree": False,
+    "remove_comments": True,
+    "remove_pis": True,
+}
+
+# lxml parsers can't be used by more than one thread at once, so each thread gets its own
+_local = threading.local()
+
+
+def _get_parser():
+    if not hasattr(_local, "parser"):
+        _local.parser = ET.XMLParser(**PARSER_OPTIONS)
+    return _local.parser
+
+
+class InvalidBroadcastXMLError(Exception):
+    pass
+
+
+def _cap(tag):
+    return f"{{{CAP_NAMESPACE}}}{tag}"
+
+
+def _ibag(tag):
+    return f"{{{IBAG_NAMESPACE}}}{tag}"
+
+
+# Elements whose text goes straight into the event
+TEXT_FIELDS = {
+    _cap("identifier"): "identifier",
+    _cap("sender"): "sender",
+    _cap("sent"): "sent",
+    _cap("msgType"): "_msg_type",
+    _cap("status"): "_status",
+    _cap("language"): "language",
+    _cap("expires"): "expires",
+    _cap("senderName"): "sender_name",
+    _cap("headline"): "headline",
+    _cap("description"): "description",
+    _cap("web"): "web",
+    _ibag("IBAG_message_number"): "message_number",
+    _ibag("IBAG_referenced_message_number"): "_referenced_message_number",
+    _ibag("IBAG_referenced_message_cap_identifier"): "_referenced_message_id",
+    _ibag("IBAG_sent_date_time"): "sent",
+    _ibag("IBAG_message_type"): "_msg_type",
+    _ibag("IBAG_cap_identifier"): "identifier",
+    _ibag("IBAG_expires_date_time"): "expires",
+    _ibag("IBAG_text_language"): "language",
+    _ibag("IBAG_text_alert_message"): "description",
+}
+
+CHANNELS_BY_CAP_EVENT = {cap_event: channel for channel, cap_event in CAP_EVENTS.items()}
+CHANNELS_BY_IBAG_CHANNEL_CATEGORY = {category: channel for channel, category in IBAG_CHANNEL_CATEGORIES.items()}
+
+IBAG_MESSAGE_TYPES = {"Alert": "alert", "Cancel": "cancel", "Link Test": "test"}
+
+
+def parse_polygon(text):
+    """
+    Parses the text of a CAP or IBAG polygon, `"lat,lon lat,lon ..."`, into a list of
+    `[lat, lon]` floats
+    """
+    try:
+        coordinates = list(map(float, (text or "").replace(",", " ").split()))
+    except ValueError as e:
+        raise InvalidBroadcastXMLError(f"Polygon has a coordinate which isn't a number ({e})") from e
+    if len(coordinates) % 2:
+        raise InvalidBroadcastXMLError(f"Polygon has an odd number of coordinates ({len(coordinates)})")
+    # Zipping an iterator with itself pairs up each latitude with the longitude after it
+    coordinates = iter(coordinates)
+    return list(map(list, zip(coordinates, coordinates)))
+
+
+def parse_cap_references(text):
+    """
+    Parses the references of a CAP cancel message, `"sender,id,sent sender,id,sent ..."`,
+    into a list of `{"message_id": id, "sent": sent}`. A sent date and time can have a space
+    in it, but the sender that follows it can't, so each is split at its last space.
+    """
+    parts = (text or "").split(",")
+    references = []
+    for i in range(1, len(parts) - 1, 2):
+        sent = parts[i + 1] if i + 2 == len(parts) else parts[i + 1].rpartition(" ")[0]
+        references.append({"message_id": parts[i], "sent": sent})
+    return references
+
+
+class _EventBuilder:
+    # Builds an event from the elements of a document, each given once it's been parsed
+    # completely, in the order they end (so children before their parents)
+
+    def __init__(self):
+        self.event = {}
+        self.areas = []
+        self.area = {}
+
+    def add(self, element):
+        tag = element.tag
+        if field := TEXT_FIELDS.get(tag):
+            self.event[field] = element.text or ""
+        elif handler := self.HANDLERS.get(tag):
+            handler(self, element)
+
+    def _add_cap_event(self, element):
+        self.event["channel"] = CHANNELS_BY_CAP_EVENT.get(element.text, TEST_CHANNEL)
+
+    def _add_cap_references(self, element):
+        self.event["references"] = parse_cap_references(element.text)
+
+    def _add_cap_area_description(self, element):
+        self.area["description"] = element.text or ""
+
+    def _add_cap_polygon(self, element):
+        self.area.setdefault("polygons", []).append(parse_polygon(element.text))
+
+    def _add_ibag_channel_category(self, element):
+        self.event["channel"] = CHANNELS_BY_IBAG_CHANNEL_CATEGORY.get(element.text, TEST_CHANNEL)
+
+    def _add_ibag_polygon(self, element):
+        self.area["polygon"] = parse_polygon(element.text)
+
+    def _add_ibag_geocode(self, element):
+        self.area.setdefault("geocodes", []).append(element.text or "")
+
+    def _add_area(self, element):
+        self.areas.append(self.area)
+        self.area = {}
+
+    def _add_cap_alert(self, element):
+        self.event["message_format"] = "cap"
+        msg_type, status = self.event.pop("_msg_type", ""), self.event.pop("_status", "")
+        self.event["message_type"] = "test" if status == "Test" else msg_type.lower()
+        if msg_type == "Alert" and status != "Test":
+            self.event["areas"] = self.areas
+
+    def _add_ibag_alert(self, element):
+        self.event["message_format"] = "ibag"
+        msg_type = self.event.pop("_msg_type", "")
+        self.event["message_type"] = IBAG_MESSAGE_TYPES.get(msg_type, msg_type.lower())
+        if self.event["message_type"] == "alert":
+            # IBAG doesn't have a headline, but an event needs one
+            self.event["headline"] = None
+            self.event["areas"] = self.areas
+        if "_referenced_message_number" in self.event:
+            self.event["references"] = [
+                {
+                    "message_number": self.event.pop("_referenced_message_number"),
+                    "message_id": self.event.pop("_referenced_message_id", ""),
+                }
+            ]
+        # A link test doesn't have an identifier
+        self.event.setdefault("identifier", None)
+
+    HANDLERS = {
+        _cap("event"): _add_cap_event,
+        _cap("references"): _add_cap_references,
+        _cap("areaDesc"): _add_cap_area_description,
+        _cap("polygon"): _add_cap_polygon,
+        _cap("area"): _add_area,
+        _cap("alert"): _add_cap_alert,
+        _ibag("IBAG_channel_category"): _add_ibag_channel_category,
+        _ibag("IBAG_area_description"): _add_cap_area_description,
+        _ibag("IBAG_polygon"): _add_ibag_polygon,
+        _ibag("IBAG_geocode"): _add_ibag_geocode,
+        _ibag("IBAG_Alert_Area"): _add_area,
+        _ibag("IBAG_Alert_Attributes"): _add_ibag_alert,
+    }
+
+    def build(self):
+        if "message_format" not in self.event:
+            raise InvalidBroadcastXMLError("Not a CAP or IBAG document")
+        return self.event
+
+
+def _check_for_doctype(element):
+    if element.getroottree().docinfo.doctype:
+        raise InvalidBroadcastXMLError("Documents with a DOCTYPE aren't allowed")
+
+
+def parse_xml_body(body):
+    """
+    Returns the event for a CAP or IBAG document, as a string or bytes, in the same shape as
+    `generate_xml_body` takes. A string is parsed as UTF-8, so any XML declaration in it
+    should say so. Polygons are lists of `[lat, lon]` floats, and any signature
+    is ignored. For IBAG the headline is `None`, since IBAG doesn't have one.
+    """
+    if isinstance(body, str):
+        # lxml won't parse a string with an XML declaration which names an encoding
+        body = body.encode("utf-8")
+    try:
+        root = ET.fromstring(body, parser=_get_parser())
+    except ET.XMLSyntaxError as e:
+        raise InvalidBroadcastXMLError(str(e)) from e
+
+    _check_for_doctype(root)
+
+    builder = _EventBuilder()
+    for _, element in ET.iterwalk(root, events=("end",)):
+        builder.add(element)
+    return builder.build()
+
+
+def iterparse_xml_body(source):
+    """
+    Returns the event for a CAP or IBAG document in `source`, a filename or a file-like
+    object opened for reading bytes, as `parse_xml_body` does. The document is parsed as it's
+    read, and each area is thrown away once it's been added to the event, so the whole tree
+    is never in memory at once.
+    """
+    builder = _EventBuilder()
+    try:
+        for i, (_, element) in enumerate(ET.iterparse(source, events=("end",), **PARSER_OPTIONS)):
+            if i == 0:
+                _check_for_doctype(element)
+            builder.add(element)
+            if element.tag in (_cap("area"), _ibag("IBAG_Alert_Area")):
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    except ET.XMLSyntaxError as e:
+        raise InvalidBroadcastXMLError(str(e)) from e
+    return builder.build()
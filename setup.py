@@ -14,7 +14,7 @@ setup(
     author="Government Digital Service",
     description="Shared python code for GOV.UK Emergency Alerts",
     long_description=__doc__,
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     include_package_data=True,
     install_requires=[
         "cachetools>=5.2.0",
@@ -35,7 +35,9 @@ setup(
         "setuptools>=78.1.0",
         "boto3>=1.38.10",
         "lxml>=5.4.0",
-        "signxml>=4.0.3",
+        # DocumentVerifier overrides how signxml verifies certificate chains, which isn't
+        # part of its public API, so we should pin:
+        "signxml>=5.1.0,<5.2",
         "dramatiq>=1.18.0",
         # README suggests breaking changes before v1.0.0 so we should pin:
         "dramatiq_sqs==0.3.1",
@@ -1,8 +1,9 @@
 from unittest.mock import patch
 
 import pytest
+from jinja2 import DictLoader, Environment
 
-from emergency_alerts_utils.template import Template
+from emergency_alerts_utils.template import Template, _BytecodeCache
 
 
 class ConcreteImplementation:
@@ -73,3 +74,21 @@ def test_compare_template():
         new_template = ConcreteTemplate({"content": "faked"})
         old_template.compare_to(new_template)
         mocked.assert_called_once_with(old_template, new_template)
+
+
+@pytest.mark.parametrize("cache_directory", ["read_only", "not_a_directory"])
+def test_templates_render_if_bytecode_cache_cant_be_used(tmp_path, mocker, cache_directory):
+    if cache_directory == "read_only":
+        directory = tmp_path
+        mocker.patch("tempfile.NamedTemporaryFile", side_effect=PermissionError("Read-only file system"))
+        mocker.patch("builtins.open", side_effect=PermissionError("Read-only file system"))
+    else:
+        # Nothing can be read from or written to a directory which is really a file, even as root
+        directory = tmp_path / "file"
+        directory.write_text("")
+
+    environment = Environment(
+        bytecode_cache=_BytecodeCache(str(directory)), loader=DictLoader({"hello.jinja2": "Hello {{ name }}"})
+    )
+
+    assert environment.get_template("hello.jinja2").render(name="world") == "Hello world"
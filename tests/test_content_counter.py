@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from emergency_alerts_utils.content_counter import BroadcastContentCounter
+from emergency_alerts_utils.template import BroadcastMessageTemplate
+
+
+def assert_counts_match_template(counter):
+    template = BroadcastMessageTemplate.from_content(counter.content)
+    assert counter.content_count == template.content_count
+    assert counter.encoded_content_count == template.encoded_content_count
+    assert counter.non_gsm_characters == template.non_gsm_characters
+    assert counter.max_content_count == template.max_content_count
+    assert counter.content_too_long == template.content_too_long
+
+
+@pytest.mark.parametrize(
+    "content",
+    (
+        "",
+        "   \n\n  ",
+        "Hello world",
+        "  Leading and trailing  ",
+        "Whitespace before punctuation , and .",
+        "Lots\n\n\n\n\nof\n\n\nnewlines\n\n",
+        "\n\nLeading newlines",
+        "Windows\r\nline\r\nendings",
+        "Extended GSM characters: ^{}\\[~]|€",
+        "Welsh characters: ŵŷ",
+        "Emoji 🚨 and ellipsis…",
+        "Zero​width and non breaking spaces",
+        "((placeholder)) and ((conditional??text))",
+        "((placeholder))\n\n\n((another))",
+        "Placeholder ((spanning\nlines))",
+        "Carriage return\r((conditional??text))\nthen newline",
+        "x" * 1_396,
+        "ŵ" * 616,
+    ),
+)
+def test_counts_match_template(content):
+    assert_counts_match_template(BroadcastContentCounter(content))
+
+
+def test_counts_match_template_while_typing():
+    counter = BroadcastContentCounter()
+    message = "Severe flood warning\n\n\nMove to higher ground – see gov.uk/alerts [now] ŵ"
+
+    for offset, character in enumerate(message):
+        counter.apply_edit(offset, 0, character)
+        assert_counts_match_template(counter)
+
+    assert counter.content == message
+
+    while counter.content:
+        counter.apply_edit(len(counter.content) - 1, 1, "")
+        assert_counts_match_template(counter)
+
+
+def test_counts_match_template_after_random_edits():
+    rng = random.Random(0)
+    alphabet = list("ab .,\t\n\r€^ŵé😀​") + ["((x))", "((y??z))", "\r\n", "(("]
+
+    counter, content = BroadcastContentCounter(), ""
+    for _ in range(500):
+        offset = rng.randint(0, len(content))
+        deleted = rng.randint(0, min(3, len(content) - offset))
+        inserted = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3)))
+
+        counter.apply_edit(offset, deleted, inserted)
+        content = content[:offset] + inserted + content[offset + deleted :]
+
+        assert counter.content == content
+        assert_counts_match_template(counter)
+
+
+def test_line_starts_stay_in_step_with_edits_across_the_content():
+    rng = random.Random(0)
+    content = "".join(f"Line {i}\n" for i in range(50))
+    counter = BroadcastContentCounter(content)
+
+    for _ in range(200):
+        # Jump around, so the line starts have to be brought up to date in both directions
+        offset = rng.randint(0, len(content))
+        deleted = rng.randint(0, min(10, len(content) - offset))
+        inserted = rng.choice(["", "x", "\n", "new\nlines\n", "\r", "\r\n"])
+
+        counter.apply_edit(offset, deleted, inserted)
+        content = content[:offset] + inserted + content[offset + deleted :]
+
+        lines = content.splitlines(keepends=True)
+        assert counter._lines == lines
+        assert [counter._get_line_start(i) for i in range(len(lines))] == [
+            sum(map(len, lines[:i])) for i in range(len(lines))
+        ]
+
+
+def test_replacing_text():
+    counter = BroadcastContentCounter("Flood warning for Shrewsbury")
+
+    counter.apply_edit(18, 10, "Ynys Môn")
+
+    assert counter.content == "Flood warning for Ynys Môn"
+    assert counter.content_count == 26
+
+
+@pytest.mark.parametrize(
+    "offset, deleted",
+    (
+        (-1, 0),
+        (6, 0),
+        (0, 6),
+        (4, 2),
+    ),
+)
+def test_edits_outside_content_raise(offset, deleted):
+    counter = BroadcastContentCounter("hello")
+
+    with pytest.raises(ValueError):
+        counter.apply_edit(offset, deleted, "x")
+
+    assert counter.content == "hello"
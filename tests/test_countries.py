@@ -1,10 +1,17 @@
+import pickle
+import subprocess
+import sys
+
 import pytest
 
 from emergency_alerts_utils.countries import (
     Country,
     CountryMapping,
     CountryNotFoundError,
+    data,
+    get_countries,
 )
+from emergency_alerts_utils.countries.build import build
 from emergency_alerts_utils.countries.data import (
     _UK_ISLANDS_LIST,
     ADDITIONAL_SYNONYMS,
@@ -13,6 +20,7 @@ from emergency_alerts_utils.countries.data import (
     UK_ISLANDS,
     WELSH_NAMES,
 )
+from emergency_alerts_utils.countries.fuzzy import FuzzyIndex, get_edit_distance
 
 from .country_synonyms import ALL as ALL_SYNONYMS
 from .country_synonyms import CROWDSOURCED_MISTAKES
@@ -101,3 +109,148 @@ def test_non_existant_countries(search, expected_error_message):
         Country(search)
     assert str(error.value) == repr(expected_error_message)
     assert isinstance(error.value, CountryNotFoundError)
+
+
+@pytest.mark.parametrize(
+    "search, expected",
+    (
+        ("Gambia", "The Gambia"),
+        ("the gambia", "The Gambia"),
+        ("THE GAMBIA", "The Gambia"),
+        ("Yr Alban", "United Kingdom"),
+        ("Alban", "United Kingdom"),
+    ),
+)
+def test_lookups_with_and_without_articles(search, expected):
+    assert Country(search).canonical_name == expected
+
+
+def test_exact_match_is_preferred_to_one_with_an_article():
+    mapping = CountryMapping({"the foo": "With article", "foo": "Without article"})
+    assert mapping["foo"] == "Without article"
+    assert mapping["the foo"] == "With article"
+    assert "foo" in mapping
+    assert "bar" not in CountryMapping({"the bar": "With article"})
+
+
+def test_index_is_updated_when_items_are_set():
+    mapping = CountryMapping({"the foo": "Foo"})
+    mapping["the foo"] = "New Foo"
+    assert mapping["foo"] == "New Foo"
+    assert mapping.search("fo") == ["New Foo"]
+
+
+@pytest.mark.parametrize(
+    "prefix, limit, expected",
+    (
+        ("gam", None, ["The Gambia"]),
+        ("GAMBI", None, ["The Gambia"]),
+        ("Unite", 3, ["United Arab Emirates", "Egypt", "United Kingdom"]),
+        ("Bosnia &", None, ["Bosnia and Herzegovina"]),
+        ("Qumran", None, []),
+    ),
+)
+def test_search(prefix, limit, expected):
+    assert CountryMapping(dict(COUNTRIES_AND_TERRITORIES)).search(prefix, limit=limit) == expected
+
+
+def test_artefact_matches_source_data():
+    artefact = data.load_artefact()
+    expected = build()
+
+    assert artefact is not None, "Run `python -m emergency_alerts_utils.countries.build`"
+    assert artefact.keys() == expected.keys()
+    for name in data.LAZY_ATTRIBUTES:
+        assert artefact[name] == expected[name], "Run `python -m emergency_alerts_utils.countries.build`"
+    assert dict(artefact["countries"]) == dict(expected["countries"])
+    assert artefact["countries"]._index == expected["countries"]._index
+
+
+def test_country_mapping_can_be_pickled():
+    mapping = pickle.loads(pickle.dumps(CountryMapping({"The Gambia": "The Gambia", "Yr Alban": "United Kingdom"})))
+    assert mapping["gambia"] == "The Gambia"
+    assert mapping["alban"] == "United Kingdom"
+    assert mapping.search("gam") == ["The Gambia"]
+
+
+def test_countries_can_be_loaded_without_artefact(mocker):
+    mocker.patch.object(data, "load_artefact", return_value=None)
+    data.load.cache_clear()
+    get_countries.cache_clear()
+    try:
+        assert Country("Gambia").canonical_name == "The Gambia"
+        assert "countries" not in data.load()
+    finally:
+        data.load.cache_clear()
+        get_countries.cache_clear()
+
+
+def test_countries_are_loaded_lazily():
+    code = (
+        "from emergency_alerts_utils.countries import Country, data; "
+        "assert data.load.cache_info().currsize == 0; "
+        "Country('France'); "
+        "assert data.load.cache_info().currsize == 1"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.parametrize(
+    "search, expected",
+    (
+        ("Frnace", [("France", 1)]),
+        ("Untied Kingdom", [("United Kingdom", 1)]),
+        ("Germnay", [("Germany", 1)]),
+        ("Gamiba", [("The Gambia", 1), ("Namibia", 2), ("Zambia", 2)]),
+        ("France", [("France", 0)]),
+        ("Qumranistan", []),
+        ("SW1A 1AA", []),
+    ),
+)
+def test_fuzzy_search(search, expected):
+    assert get_countries().fuzzy_search(search) == expected
+
+
+def test_fuzzy_search_max_distance_and_limit():
+    countries = get_countries()
+    assert countries.fuzzy_search("Frnace", max_distance=0) == []
+    assert countries.fuzzy_search("Jaman", max_distance=1) == [("Ajman", 1), ("Japan", 1)]
+    assert countries.fuzzy_search("Jaman", max_distance=1, limit=1) == [("Ajman", 1)]
+
+
+def test_fuzzy_search_returns_closest_match_for_each_country():
+    mapping = CountryMapping({"The Foo": "Foo", "Fooo": "Foo", "Bar": "Bar"})
+    assert mapping.fuzzy_search("foo") == [("Foo", 0)]
+    assert mapping.fuzzy_search("fo") == [("Foo", 1)]
+    assert mapping.fuzzy_search("ba") == [("Bar", 1)]
+    mapping["Fob"] = "Fob"
+    assert mapping.fuzzy_search("foo", max_distance=1) == [("Foo", 0), ("Fob", 1)]
+
+
+@pytest.mark.parametrize(
+    "first, second, expected",
+    (
+        ("", "", 0),
+        ("abc", "", 3),
+        ("france", "frnace", 1),
+        ("kitten", "sitting", 3),
+        ("ca", "abc", 3),
+        ("abcdef", "badcfe", 3),
+    ),
+)
+def test_get_edit_distance(first, second, expected):
+    assert get_edit_distance(first, second, 10) == expected
+    assert get_edit_distance(second, first, 10) == expected
+    assert get_edit_distance(first, second, 1) == min(expected, 2)
+
+
+def test_fuzzy_index_finds_every_key_within_distance():
+    keys = ["a", "ab", "abc", "ba", "bca", "abcd", "xyz", "abcdefgh", "bacdefhg"]
+    index = FuzzyIndex(keys)
+    for word in ["", "a", "ba", "cab", "abdc", "abcdefgh", "xzy", "zzzz"]:
+        for max_distance in range(4):
+            assert sorted(index.search(word, max_distance)) == sorted(
+                (key, distance)
+                for key in keys
+                if (distance := get_edit_distance(word, key, max_distance)) <= max_distance
+            )
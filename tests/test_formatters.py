@@ -5,12 +5,14 @@ from emergency_alerts_utils.formatters import (
     autolink_urls,
     escape_html,
     formatted_list,
+    iter_autolinked_urls,
     make_quotes_smart,
     normalise_whitespace,
     remove_smart_quotes_from_email_addresses,
     remove_whitespace_before_punctuation,
     replace_hyphens_with_en_dashes,
     sms_encode,
+    split_trailing_characters_from_url,
     strip_all_whitespace,
     strip_and_remove_obscure_whitespace,
     strip_unsupported_characters,
@@ -500,3 +502,42 @@ def test_autolink_urls_applies_correct_attributes(extra_kwargs, expected_html):
 @pytest.mark.parametrize("content", ("without link", "with link to https://example.com"))
 def test_autolink_urls_returns_markup(content):
     assert isinstance(autolink_urls(content), Markup)
+
+
+@pytest.mark.parametrize(
+    "linked_part, expected",
+    (
+        ("gov.uk/example", ("gov.uk/example", "")),
+        ("gov.uk/example.", ("gov.uk/example", ".")),
+        ("gov.uk/example)...", ("gov.uk/example", ")...")),
+        ("example.com/foo_(bar)).", ("example.com/foo_(bar)", ").")),
+        ("example.com/foo_[bar]]:", ("example.com/foo_[bar]", "]:")),
+        ("example.com/foo(((((((bar", ("example.com/foo(((((((bar", "")),
+        ("example.com/" + ")" * 10_000, ("example.com/", ")" * 10_000)),
+        ("example.com/" + "(" * 10_000 + ".," * 10_000, ("example.com/" + "(" * 10_000, ".," * 10_000)),
+    ),
+)
+def test_split_trailing_characters_from_url(linked_part, expected):
+    assert split_trailing_characters_from_url(linked_part) == expected
+
+
+@pytest.mark.parametrize(
+    "content",
+    (
+        "",
+        "without link",
+        "http://example.com",
+        "Go to gov.uk/example.",
+        "(see example.com/foo_(bar))",
+        "gov.uk/foo, gov.uk/bar",
+        "<p>gov.uk/foo</p>",
+        "firstname.lastname@example.com",
+        "Visit gov.uk/alerts)... or example.com/foo_(bar)]. " * 100,
+    ),
+)
+@pytest.mark.parametrize("classes", ("", "govuk-link"))
+def test_iter_autolinked_urls_matches_autolink_urls(content, classes):
+    chunks = list(iter_autolinked_urls(content, classes=classes))
+
+    assert all(isinstance(chunk, Markup) for chunk in chunks)
+    assert "".join(chunks) == autolink_urls(content, classes=classes)
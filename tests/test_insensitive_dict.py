@@ -1,8 +1,16 @@
 from functools import partial
 
 import pytest
+from ordered_set import OrderedSet
 
-from emergency_alerts_utils.insensitive_dict import Cell, InsensitiveDict, Row
+from emergency_alerts_utils.insensitive_dict import (
+    NORMALISED_KEY_CACHE_SIZE,
+    Cell,
+    ColumnarRows,
+    InsensitiveDict,
+    Row,
+    RowSummary,
+)
 
 
 def test_columns_as_dict_with_keys():
@@ -87,3 +95,158 @@ def test_maintains_insertion_order():
     assert d.keys() == ["b", "a", "c"]
     d["BB"] = None
     assert d.keys() == ["b", "a", "c", "bb"]
+
+
+def test_keys_is_an_ordered_snapshot():
+    d = InsensitiveDict({"A": 1, "B": 2})
+    keys = d.keys()
+    d["C"] = 3
+
+    assert isinstance(keys, OrderedSet)
+    assert keys == ["a", "b"]
+    assert keys[1] == "b"
+
+
+def test_keys_contains_only_matches_normalised_keys():
+    keys = InsensitiveDict({"First Name": 1}).keys()
+
+    assert "firstname" in keys
+    assert "First Name" not in keys
+
+
+def test_keys_set_operations_keep_order():
+    old = InsensitiveDict.from_keys(["c", "b", "a", "d"])
+    new = InsensitiveDict.from_keys(["d", "e", "a", "f"])
+
+    assert list(old.keys() - new.keys()) == ["c", "b"]
+    assert list(new.keys() - old.keys()) == ["e", "f"]
+    assert list(old.keys() | new.keys()) == ["c", "b", "a", "d", "e", "f"]
+    assert old.keys() & new.keys() == {"a", "d"}
+    assert old.keys() - {"c", "b"} == ["a", "d"]
+
+
+def test_make_key_is_consistent_for_many_distinct_keys():
+    keys = [f"Column {i}" for i in range(1_000)]
+
+    assert [InsensitiveDict.make_key(key) for key in keys] == [f"column{i}" for i in range(1_000)]
+    assert [InsensitiveDict.make_key(key) for key in keys] == [f"column{i}" for i in range(1_000)]
+    assert InsensitiveDict.make_key(None) is None
+
+
+def test_make_key_interns_normalised_keys():
+    assert InsensitiveDict.make_key("Date Of Birth") is InsensitiveDict.make_key("date_of_birth")
+
+
+@pytest.mark.parametrize("key", ["First name", "first_name", "FIRSTNAME"])
+def test_get(key):
+    d = InsensitiveDict({"first name": "Jo", "empty": None})
+
+    assert d.get(key) == "Jo"
+    assert d.get("empty", "default") is None
+    assert d.get("missing", "default") == "default"
+
+
+def test_row_with_placeholders():
+    row = Row(
+        {"Phone number": "07700900001", "First_name": "Alex", "Town": "London"},
+        index=0,
+        error_fn=None,
+        template=None,
+        placeholders=["first name"],
+    )
+    assert row.personalisation == {"firstname": "Alex"}
+    assert row["phone number"].ignore is True
+    assert row["first name"].ignore is False
+
+
+def _error_fn(key, value):
+    if not value:
+        return Cell.missing_field_error
+    if key == "phone number" and not value.startswith("07"):
+        return "Not a UK mobile number"
+
+
+def _batch_error_fn(key, values):
+    return [_error_fn(key, value) for value in values]
+
+
+ROWS = [
+    {"phone number": "07700900001", "name": "Alex"},
+    {"phone number": "01632960001", "name": "Sam"},
+    {"phone number": "07700900003", "name": ""},
+    {"phone number": "07700900004", "name": "Jo"},
+]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        {"error_fn": _error_fn},
+        {"batch_error_fn": _batch_error_fn},
+    ),
+)
+@pytest.mark.parametrize("chunk_size", (1, 3, 1000))
+def test_columnar_rows_match_row(kwargs, chunk_size):
+    rows = ColumnarRows(["phone number", "name"], placeholders=["name"], **kwargs)
+    rows.add_rows(ROWS, chunk_size=chunk_size)
+
+    expected = [
+        Row(row_dict, index=index, error_fn=_error_fn, template=None, placeholders=["name"])
+        for index, row_dict in enumerate(ROWS)
+    ]
+
+    assert len(rows) == 4
+    assert rows.has_errors is True
+    assert list(rows.summaries) == [RowSummary(row.index, row.has_error, row.has_missing_data) for row in expected]
+    assert rows.indexes_with_errors == [1, 2]
+    assert list(rows.rows_with_errors()) == [expected[1], expected[2]]
+    assert [dict(row) for row in rows.rows_with_errors()] == [dict(expected[1]), dict(expected[2])]
+    assert [row.personalisation for row in rows.rows_with_errors()] == [{"name": "Sam"}, {"name": ""}]
+
+
+def test_columnar_rows_keep_per_column_bitmaps():
+    rows = ColumnarRows(["phone number", "name"], error_fn=_error_fn)
+    rows.add_columns(
+        {
+            "phone number": ["07700900001", "01632960001", "07700900003"] * 4,
+            "name": ["Alex", "Sam", ""] * 4,
+        }
+    )
+    assert rows.error_bitmaps["phone number"] == bytearray([0b10010010, 0b00000100])
+    assert rows.error_bitmaps["name"] == bytearray([0b00100100, 0b00001001])
+    assert rows.missing_data_bitmaps["phone number"] == bytearray(2)
+    assert [rows.has_error(index) for index in range(3)] == [False, True, True]
+    assert [rows.has_missing_data(index) for index in range(3)] == [False, False, True]
+
+
+def test_columnar_rows_without_errors():
+    rows = ColumnarRows(["phone number"], error_fn=_error_fn)
+    rows.add_rows([{"phone number": "07700900001"}] * 10)
+    assert rows.has_errors is False
+    assert not any(summary.has_error for summary in rows.summaries)
+    assert list(rows.rows_with_errors()) == []
+
+
+def test_columnar_rows_treat_missing_headings_as_empty():
+    rows = ColumnarRows(["phone number", "name"], error_fn=_error_fn)
+    rows.add_rows([{"phone number": "07700900001"}])
+    assert list(rows.summaries) == [RowSummary(0, True, True)]
+
+
+def test_columnar_rows_need_columns_of_the_same_length():
+    rows = ColumnarRows(["phone number", "name"], error_fn=_error_fn)
+    with pytest.raises(ValueError):
+        rows.add_columns({"phone number": ["07700900001"], "name": []})
+
+
+def test_columnar_rows_only_take_one_error_fn():
+    with pytest.raises(TypeError):
+        ColumnarRows(["phone number"], error_fn=_error_fn, batch_error_fn=_batch_error_fn)
+
+
+def test_make_key_cache_is_bounded():
+    for i in range(NORMALISED_KEY_CACHE_SIZE + 100):
+        InsensitiveDict.make_key(f"Uploaded column {i}")
+
+    assert InsensitiveDict.make_key.cache_info().currsize == NORMALISED_KEY_CACHE_SIZE
+    assert InsensitiveDict.make_key("Uploaded column 0") == "uploadedcolumn0"
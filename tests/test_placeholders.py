@@ -1,8 +1,15 @@
+import copy
+import pickle
 import re
 
 import pytest
+from ordered_set import OrderedSet
 
-from emergency_alerts_utils.field import Placeholder
+from emergency_alerts_utils.field import (
+    Placeholder,
+    PlaceholderIndex,
+    PlaceholderIndexStats,
+)
 
 
 @pytest.mark.parametrize(
@@ -64,3 +71,103 @@ def test_placeholder_raises_if_getting_conditional_body_on_non_conditional():
 def test_placeholder_can_be_constructed_from_regex_match():
     match = re.search(r"\(\(.*\)\)", "foo ((bar)) baz")
     assert Placeholder.from_match(match).name == "bar"
+
+
+def test_placeholders_are_interned_by_body():
+    assert Placeholder("((a??b))") is Placeholder("a??b")
+    assert Placeholder("a??b") is not Placeholder("a??c")
+
+
+def test_placeholder_from_match_reuses_interned_placeholder():
+    match = re.search(r"\(\(.*\)\)", "foo ((bar)) baz")
+    assert Placeholder.from_match(match) is Placeholder("bar")
+
+
+def test_placeholder_is_immutable():
+    placeholder = Placeholder("a??b")
+
+    with pytest.raises(AttributeError):
+        placeholder.name = "c"
+
+    with pytest.raises(AttributeError):
+        placeholder.anything_else = "c"
+
+    with pytest.raises(AttributeError):
+        del placeholder.body
+
+    assert placeholder.name == "a"
+
+
+def test_placeholder_equality():
+    assert Placeholder("a??b") == Placeholder("((a??b))")
+    assert Placeholder("a??b") != Placeholder("a")
+    assert Placeholder("a") != "a"
+    assert len({Placeholder("a"), Placeholder("((a))"), Placeholder("b")}) == 2
+
+
+def test_placeholder_can_be_copied_and_pickled():
+    placeholder = Placeholder("a??b")
+
+    assert copy.copy(placeholder) is placeholder
+    assert pickle.loads(pickle.dumps(placeholder)) is placeholder
+
+
+def test_placeholder_index_returns_placeholder_info():
+    info = PlaceholderIndex()["((First Name)) ((first_name)) ((b??show)) ((c)) ((b))"]
+
+    assert info.names == OrderedSet(["First Name", "first_name", "b", "c"])
+    assert info.keys == ("firstname", "firstname", "b", "c")
+    assert info.conditionals == (False, False, True, False)
+    assert dict(info.names_by_key) == {"firstname": "first_name", "b": "b", "c": "c"}
+
+
+@pytest.mark.parametrize("content", ("", None, "no placeholders"))
+def test_placeholder_index_handles_content_without_placeholders(content):
+    info = PlaceholderIndex()[content]
+
+    assert info.names == OrderedSet()
+    assert info.keys == info.conditionals == ()
+    assert dict(info.names_by_key) == {}
+
+
+def test_placeholder_index_names_by_key_is_read_only():
+    with pytest.raises(TypeError):
+        PlaceholderIndex()["((a))"].names_by_key["b"] = "b"
+
+
+def test_placeholder_index_counts_hits_misses_and_evictions():
+    index = PlaceholderIndex(maxsize=2)
+
+    first = index["((a))"]
+    assert index["((a))"] is first
+    index["((b))"]
+    index["((c))"]
+    assert index["((a))"] is not first
+
+    assert index.stats == PlaceholderIndexStats(hits=1, misses=4, evictions=2, currsize=2, maxsize=2)
+    assert index.hit_rate == 0.2
+
+
+def test_placeholder_index_evicts_least_recently_used():
+    index = PlaceholderIndex(maxsize=2)
+
+    a = index["((a))"]
+    index["((b))"]
+    index["((a))"]
+    index["((c))"]
+
+    assert index["((a))"] is a
+    assert index.stats.evictions == 1
+
+
+def test_placeholder_index_can_be_resized_and_cleared():
+    index = PlaceholderIndex(maxsize=3)
+    for content in ("((a))", "((b))", "((c))"):
+        index[content]
+
+    index.resize(1)
+    assert index.stats == PlaceholderIndexStats(hits=0, misses=3, evictions=2, currsize=1, maxsize=1)
+
+    index.clear()
+    assert index.stats == PlaceholderIndexStats(hits=0, misses=0, evictions=0, currsize=0, maxsize=1)
+    assert index.hit_rate == 0.0
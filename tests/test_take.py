@@ -1,4 +1,17 @@
-from emergency_alerts_utils.take import Take
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+from emergency_alerts_utils import take
+from emergency_alerts_utils.take import (
+    HistogramSink,
+    Take,
+    TakeStatistics,
+    get_stage_name,
+    instrumented,
+)
 
 
 def _uppercase(value):
@@ -17,3 +30,89 @@ def test_take():
     assert "Service name: HELLO WORLD!" == Take("hello world").then(_uppercase).then(_append, "!").then(
         _prepend_with_service_name, service_name="Service name"
     )
+
+
+def test_take_is_not_instrumented_by_default():
+    assert Take.then is take._uninstrumented_then
+
+
+def test_instrumented_take_records_each_stage():
+    statistics = TakeStatistics()
+
+    with instrumented(statistics):
+        assert Take(" hello world ").then(str.strip).then(_uppercase).then(_append, "!") == "HELLO WORLD!"
+        Take("again").then(_uppercase)
+
+    assert dict(statistics.calls) == {"str.strip": 1, "_uppercase": 2, "_append": 1}
+    assert set(statistics.total_seconds) == {"str.strip", "_uppercase", "_append"}
+    assert all(seconds >= 0 for seconds in statistics.total_seconds.values())
+
+    statistics.reset()
+    assert not statistics.calls
+
+
+def test_uninstrument_restores_original_then():
+    statistics = TakeStatistics()
+
+    with instrumented(statistics):
+        assert Take.then is not take._uninstrumented_then
+
+    assert Take.then is take._uninstrumented_then
+    Take("hello").then(_uppercase)
+    assert not statistics.calls
+
+
+def test_uninstrument_while_a_stage_is_running_on_another_thread():
+    statistics = TakeStatistics()
+    stage_started, uninstrumented = threading.Event(), threading.Event()
+
+    def _wait_for_uninstrument(value):
+        stage_started.set()
+        uninstrumented.wait(timeout=5)
+        return value.upper()
+
+    take.instrument(statistics)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(lambda: Take("hello").then(_wait_for_uninstrument).then(_append, "!"))
+        stage_started.wait(timeout=5)
+        take.uninstrument()
+        uninstrumented.set()
+
+        assert future.result() == "HELLO!"
+
+    # The stage which was running is reported to the sink it started with, and the one
+    # after it isn't instrumented
+    assert list(statistics.calls) == [
+        "test_uninstrument_while_a_stage_is_running_on_another_thread.<locals>._wait_for_uninstrument"
+    ]
+
+
+def test_instrumented_take_records_stage_which_raises():
+    statistics = TakeStatistics()
+
+    with instrumented(statistics), pytest.raises(ZeroDivisionError):
+        Take("hello").then(lambda value: 1 / 0)
+
+    assert dict(statistics.calls) == {"test_instrumented_take_records_stage_which_raises.<locals>.<lambda>": 1}
+
+
+@pytest.mark.parametrize(
+    "func, expected_name",
+    [
+        (_uppercase, "_uppercase"),
+        (str.strip, "str.strip"),
+        (str, "str"),
+        (partial(_append, to_append="!"), "_append"),
+    ],
+)
+def test_get_stage_name(func, expected_name):
+    assert get_stage_name(func) == expected_name
+
+
+def test_histogram_sink_records_duration_with_stage_attribute(mocker):
+    histogram = mocker.Mock()
+
+    with instrumented(HistogramSink(histogram)):
+        Take("hello").then(_uppercase)
+
+    histogram.record.assert_called_once_with(mocker.ANY, attributes={"stage": "_uppercase"})
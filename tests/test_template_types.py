@@ -200,6 +200,42 @@ def test_sms_message_preview_hides_sender_by_default():
     assert SMSPreviewTemplate({"content": "foo", "template_type": "sms"}).show_sender is False
 
 
+@pytest.mark.parametrize(
+    "template_class, template_type",
+    (
+        (SMSPreviewTemplate, "sms"),
+        (BroadcastPreviewTemplate, "broadcast"),
+    ),
+)
+@pytest.mark.parametrize("show_sender", (True, False))
+@pytest.mark.parametrize("show_recipient", (True, False))
+@pytest.mark.parametrize("sender", (None, "GOVUK", "<b>Tom & Jerry</b>"))
+@pytest.mark.parametrize(
+    "content, values",
+    (
+        ("foo", None),
+        ("Hello ((name)), see gov.uk/alerts <b>now</b>\n\n\n\nthanks", {"phone number": "07700 <900000>"}),
+        ("((name??conditional)) & ((missing))", {"name": "yes"}),
+    ),
+)
+def test_preview_renders_the_same_without_jinja(
+    template_class, template_type, show_sender, show_recipient, sender, content, values
+):
+    kwargs = {
+        "values": values,
+        "sender": sender,
+        "show_sender": show_sender,
+        "show_recipient": show_recipient,
+    }
+    template = {"content": content, "template_type": template_type}
+
+    rendered_with_jinja = str(template_class(template, **kwargs))
+    rendered_without_jinja = str(template_class(template, use_jinja=False, **kwargs))
+
+    assert rendered_without_jinja == rendered_with_jinja
+    assert isinstance(rendered_without_jinja, Markup)
+
+
 @mock.patch("emergency_alerts_utils.template.sms_encode", return_value="downgraded")
 @pytest.mark.parametrize(
     "template_class, extra_args, expected_call",
@@ -537,7 +573,6 @@ def test_is_message_empty_broadcast_templates(content, values, expected_result,
             "sms",
             {},
             [
-                mock.call("content"),  # This is to get the placeholders
                 mock.call("content", {}, html="passthrough"),
             ],
         ),
@@ -1,16 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import phonenumbers
 import pytest
 
+import emergency_alerts_utils.validation
 from emergency_alerts_utils.validation import (
+    BulkValidator,
     InvalidEmailError,
     InvalidPhoneError,
+    RecipientAllowlist,
     allowed_to_send_to,
     format_phone_number_human_readable,
     format_recipient,
     is_uk_phone_number,
     normalise_phone_number,
+    normalise_phone_numbers,
     try_validate_and_format_phone_number,
     validate_and_format_phone_number,
     validate_email_address,
+    validate_email_addresses,
     validate_phone_number,
 )
 
@@ -194,6 +203,54 @@ def test_normalise_phone_number_raises_if_unparseable_characters(phone_number):
         normalise_phone_number(phone_number)
 
 
+@pytest.mark.parametrize(
+    "phone_number, expected",
+    [
+        ("", ""),
+        ("0", ""),
+        ("\u200b\t\t+44 (0)7123 \ufeff 456 789 \r\n", "4407123456789"),
+        ("\u0660\u0667\u0667", "\u0660\u0667\u0667"),  # Arabic-Indic digits, which `int` accepts
+    ],
+)
+def test_normalise_phone_number(phone_number, expected):
+    assert normalise_phone_number(phone_number) == expected
+
+
+@pytest.mark.parametrize("phone_number", ["\u00b2", "1_000", "07700.900123", "\x1c"])
+def test_normalise_phone_number_rejects_characters_int_would(phone_number):
+    with pytest.raises(InvalidPhoneError) as e:
+        normalise_phone_number(phone_number)
+    assert str(e.value) == "Must not contain letters or symbols"
+
+
+@pytest.mark.parametrize(
+    "phone_numbers",
+    [
+        [],
+        [""],
+        ["", ""],
+        valid_uk_phone_numbers,
+        valid_international_phone_numbers,
+        valid_uk_phone_numbers + ["abcd", "", "079OO900123"],
+        ["07700900123", "0770\x00900123"],
+    ],
+)
+def test_normalise_phone_numbers_matches_normalise_phone_number(phone_numbers):
+    expected_normalised, expected_errors = [], []
+    for phone_number in phone_numbers:
+        try:
+            expected_normalised.append(normalise_phone_number(phone_number))
+            expected_errors.append(None)
+        except InvalidPhoneError as e:
+            expected_normalised.append(None)
+            expected_errors.append(str(e))
+
+    normalised, errors = normalise_phone_numbers(phone_numbers)
+
+    assert normalised == expected_normalised
+    assert [error and str(error) for error in errors] == expected_errors
+
+
 @pytest.mark.parametrize("phone_number", valid_uk_phone_numbers)
 @pytest.mark.parametrize(
     "extra_args",
@@ -256,6 +313,41 @@ def test_validate_email_address_raises_for_invalid(email_address):
     assert str(e.value) == "Not a valid email address"
 
 
+def test_validate_email_addresses_matches_validate_email_address():
+    email_addresses = list(valid_email_addresses + invalid_email_addresses) * 2
+    expected_validated, expected_errors = [], []
+    for email_address in email_addresses:
+        try:
+            expected_validated.append(validate_email_address(email_address))
+            expected_errors.append(None)
+        except InvalidEmailError as e:
+            expected_validated.append(None)
+            expected_errors.append(str(e))
+
+    validated, errors = validate_email_addresses(email_addresses)
+
+    assert validated == expected_validated
+    assert [error and str(error) for error in errors] == expected_errors
+
+
+def test_validate_email_addresses_checks_each_hostname_once(mocker):
+    mock_is_valid_email_hostname = mocker.patch(
+        "emergency_alerts_utils.validation._is_valid_email_hostname", side_effect=lambda hostname: "." in hostname
+    )
+    validated, errors = validate_email_addresses(
+        ["one@example.com", "two@example.com", "three@example", "four@example.com", "not an email"]
+    )
+    assert validated == ["one@example.com", "two@example.com", None, "four@example.com", None]
+    assert [type(error) for error in errors] == [
+        type(None),
+        type(None),
+        InvalidEmailError,
+        type(None),
+        InvalidEmailError,
+    ]
+    assert sorted(call.args for call in mock_is_valid_email_hostname.call_args_list) == [("example",), ("example.com",)]
+
+
 @pytest.mark.parametrize("phone_number", valid_uk_phone_numbers)
 def test_validates_against_guestlist_of_phone_numbers(phone_number):
     assert allowed_to_send_to(phone_number, ["07123456789", "07700900460", "test@example.com"])
@@ -267,6 +359,69 @@ def test_validates_against_guestlist_of_email_addresses(email_address):
     assert not allowed_to_send_to(email_address, ["very_special_and_unique@example.com"])
 
 
+def test_allowed_to_send_to_formats_a_list_allowlist_once(mocker):
+    allowlist = ["07700 900470", "once@example.com"]
+    mock_format_recipient = mocker.spy(emergency_alerts_utils.validation, "format_recipient")
+
+    assert allowed_to_send_to("07700900470", allowlist)
+    assert not allowed_to_send_to("07700900471", list(allowlist))
+
+    assert [call.args for call in mock_format_recipient.call_args_list] == [
+        ("07700 900470",),
+        ("once@example.com",),
+        ("07700900470",),
+        ("07700900471",),
+    ]
+
+
+@pytest.mark.parametrize("phone_number", valid_uk_phone_numbers)
+def test_validates_against_recipient_allowlist_of_phone_numbers(phone_number):
+    assert allowed_to_send_to(phone_number, RecipientAllowlist(["07123456789", "07700900460", "test@example.com"]))
+    assert not allowed_to_send_to(phone_number, RecipientAllowlist(["07700900460", "07700900461", "test@example.com"]))
+
+
+@pytest.mark.parametrize("email_address", valid_email_addresses)
+def test_validates_against_recipient_allowlist_of_email_addresses(email_address):
+    allowlist = RecipientAllowlist(["very_special_and_unique@example.com"])
+    assert not allowed_to_send_to(email_address, allowlist)
+    allowlist.add(email_address)
+    assert allowed_to_send_to(email_address, allowlist)
+
+
+def test_recipient_allowlist_formats_entries_once(mocker):
+    allowlist = RecipientAllowlist(["07700 900460", "Test@Example.com", None])
+    assert list(allowlist) == ["447700900460", "test@example.com", ""]
+
+    mock_format_recipient = mocker.patch(
+        "emergency_alerts_utils.validation.format_recipient", return_value="447700900460"
+    )
+    assert "+44 7700 900460" in allowlist
+    mock_format_recipient.assert_called_once_with("+44 7700 900460")
+
+
+def test_recipient_allowlist_add_and_remove():
+    allowlist = RecipientAllowlist()
+    assert len(allowlist) == 0
+    assert "07700900460" not in allowlist
+
+    allowlist.add("07700900460")
+    allowlist.add("+447700900460")
+    assert len(allowlist) == 1
+
+    allowlist.remove("447700900460")
+    assert "07700900460" in allowlist
+
+    allowlist.remove("07700 900460")
+    assert "07700900460" not in allowlist
+
+    with pytest.raises(KeyError):
+        allowlist.remove("07700900460")
+    allowlist.discard("07700900460")
+
+    allowlist.update(["test@example.com", "07700900461"])
+    assert repr(allowlist) == "RecipientAllowlist(['test@example.com', '447700900461'])"
+
+
 @pytest.mark.parametrize(
     "phone_number, expected_formatted",
     [
@@ -302,3 +457,57 @@ def test_try_format_recipient_doesnt_throw():
 
 def test_format_phone_number_human_readable_doenst_throw():
     assert format_phone_number_human_readable("ALPHANUM3R1C") == "ALPHANUM3R1C"
+
+
+@pytest.mark.parametrize("chunk_size", (1, 3, 100))
+def test_bulk_validator_yields_results_in_order(chunk_size):
+    recipients = valid_uk_phone_numbers + ["07890x32109", "+44 (0)7123 456 789"] * 5
+    validator = BulkValidator(
+        partial(validate_phone_number, international=True),
+        max_workers=2,
+        chunk_size=chunk_size,
+        max_pending_chunks=2,
+    )
+
+    results = list(validator.validate(iter(recipients)))
+
+    assert len(results) == len(recipients)
+    for recipient, (normalised, error) in zip(recipients, results):
+        if "x" in recipient:
+            assert normalised is None
+            assert isinstance(error, InvalidPhoneError)
+            assert str(error) == "Must not contain letters or symbols"
+        else:
+            assert normalised == validate_phone_number(recipient, international=True)
+            assert error is None
+
+    assert validator.validated_count == len(recipients)
+    assert validator.error_count == 5
+    assert validator.per_second > 0
+
+
+def test_bulk_validator_uses_given_executor():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        validator = BulkValidator(validate_email_address, executor=executor, chunk_size=2)
+        results = list(validator.validate(["test@example.com", "not an email", " test@example.gov.uk "]))
+
+    assert [normalised for normalised, _ in results] == ["test@example.com", None, "test@example.gov.uk"]
+    assert [type(error) for _, error in results] == [type(None), InvalidEmailError, type(None)]
+
+
+def test_bulk_validator_raises_unexpected_errors():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        validator = BulkValidator(validate_email_address, executor=executor)
+        with pytest.raises(AttributeError):
+            list(validator.validate([None]))
+
+
+@pytest.mark.parametrize("first_digits", [f"7{digit}" for digit in range(10)])
+def test_format_phone_number_human_readable_matches_phonenumbers_for_uk_mobiles(first_digits):
+    for next_digits in range(100):
+        for last_digits in ("000000", "123456", "900999"):
+            phone_number = f"44{first_digits}{next_digits:02}{last_digits}"
+            assert format_phone_number_human_readable(phone_number) == phonenumbers.format_number(
+                phonenumbers.parse("+" + phone_number, None),
+                phonenumbers.PhoneNumberFormat.NATIONAL,
+            )
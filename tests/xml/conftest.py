@@ -1,8 +1,39 @@
 import os
 
+import pytest
+
+from tests.xml.utils import (
+    certificate_to_pem,
+    key_to_pem,
+    make_certificate,
+    make_key,
+)
+
 os.environ["CBC_URL"] = "https://192.168.1.99:8899/cap/oasis/alert"
 os.environ["CBC_NAME"] = "mno-1"
 os.environ["CBC_A_URL"] = "https://192.168.1.99:8899/cap/oasis/alert"
 os.environ["CBC_A_NAME"] = "mno-1"
 os.environ["CBC_B_URL"] = "https://192.168.1.99:8899/cap/oasis/alert"
 os.environ["CBC_B_NAME"] = "mno-1"
+
+
+@pytest.fixture(scope="session")
+def certificate_authority(tmp_path_factory):
+    """
+    A key and certificate for a CA, and the path of a file with the certificate in it
+    """
+    key = make_key()
+    certificate = make_certificate("ca.example", key, ca=True)
+    path = tmp_path_factory.mktemp("certificate_authority") / "ca.pem"
+    path.write_text(certificate_to_pem(certificate))
+    return key, certificate, str(path)
+
+
+@pytest.fixture(scope="session")
+def signing_key_and_certificate(certificate_authority):
+    """
+    A key, and a certificate for it issued by `certificate_authority`, both as PEM
+    """
+    ca_key, ca_certificate, _ = certificate_authority
+    key = make_key()
+    return key_to_pem(key), certificate_to_pem(make_certificate("signer.example", key, ca_key, ca_certificate))
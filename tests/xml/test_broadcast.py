@@ -1,15 +1,31 @@
+import datetime
+import hashlib
+import io
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 from lxml import etree
-from signxml import XMLVerifier
+from signxml import XMLSigner, XMLVerifier
+from signxml.exceptions import InvalidCertificate, InvalidDigest, InvalidSignature
 
-from emergency_alerts_utils.xml.broadcast import generate_xml_body
+from emergency_alerts_utils.xml.broadcast import (
+    generate_xml_bodies,
+    generate_xml_body,
+    write_xml_body,
+)
 from emergency_alerts_utils.xml.common import (
+    DocumentSigner,
+    DocumentVerifier,
     digitally_sign,
+    get_signer,
+    get_verifier,
     validate_channel,
     validate_message_format,
     validate_message_type,
+    verify_signature,
+    write_polygon,
 )
 from tests.xml.utils import (  # noqa: F401 - events are eval-ed by tests
     ALERT_CAP_EVENT,
@@ -18,6 +34,9 @@ from tests.xml.utils import (  # noqa: F401 - events are eval-ed by tests
     CANCEL_IBAG_EVENT,
     LINK_TEST_CAP_EVENT,
     LINK_TEST_IBAG_EVENT,
+    certificate_to_pem,
+    key_to_pem,
+    make_certificate,
 )
 
 
@@ -145,6 +164,65 @@ def test_message_signature_is_valid(mocker):
     assert_valid_xmldsig(etree.tostring(signature, encoding="unicode"))
 
 
+def sign_without_cache(xml, key, cert):
+    return XMLSigner(
+        signature_algorithm="rsa-sha256",
+        digest_algorithm="sha256",
+        c14n_algorithm="http://www.w3.org/2006/12/xml-c14n11",
+    ).sign(xml, key=key, cert=cert)
+
+
+def test_document_signer_signs_the_same_as_xml_signer():
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    data_to_sign = "<Test><Child>Some Value</Child></Test>"
+
+    signed_xml = DocumentSigner(key, cert).sign(etree.fromstring(data_to_sign))
+
+    assert etree.tostring(signed_xml) == etree.tostring(sign_without_cache(etree.fromstring(data_to_sign), key, cert))
+
+
+def test_document_signer_accepts_bytes():
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    data_to_sign = "<Test><Child>Some Value</Child></Test>"
+
+    signed_xml = DocumentSigner(key.encode(), cert.encode()).sign(etree.fromstring(data_to_sign))
+
+    assert etree.tostring(signed_xml) == etree.tostring(sign_without_cache(etree.fromstring(data_to_sign), key, cert))
+
+
+@pytest.mark.parametrize("cert", [None, "chain"])
+def test_digitally_sign_accepts_no_certificate_or_a_chain(cert):
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    if cert == "chain":
+        cert = [open(os.path.join(os.path.dirname(__file__), "example.pem")).read()]
+    data_to_sign = "<Test><Child>Some Value</Child></Test>"
+
+    signed_xml = digitally_sign(etree.fromstring(data_to_sign), key=key, cert=cert)
+
+    assert etree.tostring(signed_xml) == etree.tostring(sign_without_cache(etree.fromstring(data_to_sign), key, cert))
+
+
+def test_get_signer_reuses_signer_for_the_same_key_and_certificate():
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+
+    assert get_signer(key, cert) is get_signer(key, cert)
+
+
+def test_document_signer_can_be_shared_between_threads():
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    signer = DocumentSigner(key, cert)
+    documents = [f"<Test><Child>{i}</Child></Test>" for i in range(20)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        signed = list(executor.map(lambda document: etree.tostring(signer.sign(etree.fromstring(document))), documents))
+
+    assert signed == [etree.tostring(sign_without_cache(etree.fromstring(d), key, cert)) for d in documents]
+
+
 def test_signed_cap_message_is_valid(mocker):
     key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
     cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
@@ -153,6 +231,237 @@ def test_signed_cap_message_is_valid(mocker):
     assert_valid_cap_xml(etree.fromstring(xml_root))
 
 
+@pytest.mark.parametrize("event", [ALERT_CAP_EVENT, CANCEL_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_IBAG_EVENT])
+def test_generate_xml_bodies_matches_generate_xml_body_for_each_provider(event):
+    providers = [
+        {"message_format": "cap"},
+        {"message_format": "ibag", "message_number": "00000001"},
+        {"message_format": "CAP"},
+        {"message_format": "ibag", "message_number": "00000002"},
+    ]
+
+    bodies = generate_xml_bodies(event, providers, max_workers=2)
+
+    assert [body for body, _ in bodies] == [
+        generate_xml_body(event | {"message_format": "cap"}),
+        generate_xml_body(event | {"message_format": "ibag", "message_number": "00000001"}),
+        generate_xml_body(event | {"message_format": "cap"}),
+        generate_xml_body(event | {"message_format": "ibag", "message_number": "00000002"}),
+    ]
+    assert all(seconds >= 0 for _, seconds in bodies)
+
+
+def test_generate_xml_bodies_uses_message_number_from_event_if_provider_has_none():
+    [ibag_body] = generate_xml_bodies(ALERT_IBAG_EVENT, [{"message_format": "ibag"}])
+
+    assert ibag_body.body == generate_xml_body(ALERT_IBAG_EVENT)
+
+
+def test_generate_xml_bodies_signs_for_providers_with_a_key():
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    providers = [
+        {"message_format": "cap", "signing_key": key, "signing_certificate": cert},
+        {"message_format": "ibag", "message_number": "00000001", "signing_key": key, "signing_certificate": cert},
+        {"message_format": "cap"},
+    ]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        bodies = generate_xml_bodies(ALERT_CAP_EVENT, providers, executor=executor)
+
+    assert [body for body, _ in bodies] == [
+        generate_xml_body(ALERT_CAP_EVENT, signing_enabled=True, signing_key=key, signing_certificate=cert),
+        generate_xml_body(
+            ALERT_CAP_EVENT | {"message_format": "ibag", "message_number": "00000001"},
+            signing_enabled=True,
+            signing_key=key,
+            signing_certificate=cert,
+        ),
+        generate_xml_body(ALERT_CAP_EVENT),
+    ]
+    assert_valid_cap_xml(etree.fromstring(bodies[0].body))
+
+
+def test_generate_xml_bodies_with_no_providers():
+    assert generate_xml_bodies(ALERT_CAP_EVENT, []) == []
+
+
+def test_generate_xml_bodies_raises_for_unknown_format():
+    with pytest.raises(KeyError):
+        generate_xml_bodies(ALERT_CAP_EVENT, [{"message_format": "bad"}])
+
+
+def test_generate_xml_body_logs_digest_rather_than_body(caplog):
+    with caplog.at_level(logging.INFO, logger="broadcast"):
+        body = generate_xml_body(ALERT_CAP_EVENT | {"description": "Rhybudd llifogydd ŵ"})
+
+    [record] = caplog.records
+    assert record.identifier == ALERT_CAP_EVENT["identifier"]
+    assert record.body_bytes == len(body.encode("utf-8")) == len(body) + 1
+    assert record.body_sha256 == hashlib.sha256(body.encode("utf-8")).hexdigest()
+    assert body not in caplog.text
+
+
+def test_generate_xml_body_logs_body_if_asked_to(caplog):
+    with caplog.at_level(logging.INFO, logger="broadcast"):
+        body = generate_xml_body(ALERT_CAP_EVENT, log_body=True)
+
+    assert [record.getMessage() for record in caplog.records][1] == f"Body: {body}"
+
+
+def test_generate_xml_body_doesnt_work_out_digest_if_not_logging(caplog, mocker):
+    mock_sha256 = mocker.patch("emergency_alerts_utils.xml.broadcast.hashlib.sha256")
+
+    with caplog.at_level(logging.WARNING, logger="broadcast"):
+        generate_xml_body(ALERT_CAP_EVENT, log_body=True)
+
+    assert caplog.records == []
+    assert not mock_sha256.called
+
+
+def test_generate_xml_bodies_logs_each_body(caplog):
+    with caplog.at_level(logging.INFO, logger="broadcast"):
+        bodies = generate_xml_bodies(ALERT_CAP_EVENT, [{"message_format": "cap"}, {"message_format": "ibag"}])
+
+    assert sorted(record.body_bytes for record in caplog.records) == sorted(len(body.encode()) for body, _ in bodies)
+
+
+@pytest.mark.parametrize("event", [ALERT_CAP_EVENT, CANCEL_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_IBAG_EVENT])
+@pytest.mark.parametrize("signing_enabled", [False, True])
+def test_write_xml_body_writes_the_same_as_generate_xml_body(event, signing_enabled):
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    output = io.BytesIO()
+
+    write_xml_body(event, output, signing_enabled=signing_enabled, signing_key=key, signing_certificate=cert)
+
+    assert output.getvalue() == generate_xml_body(
+        event, signing_enabled=signing_enabled, signing_key=key, signing_certificate=cert
+    ).encode("utf-8")
+
+
+def test_write_xml_body_logs_digest(caplog):
+    output = io.BytesIO()
+
+    with caplog.at_level(logging.INFO, logger="broadcast"):
+        write_xml_body(ALERT_CAP_EVENT, output)
+
+    [record] = caplog.records
+    assert record.identifier == ALERT_CAP_EVENT["identifier"]
+    assert record.body_bytes == len(output.getvalue())
+    assert record.body_sha256 == hashlib.sha256(output.getvalue()).hexdigest()
+
+
+def test_write_xml_body_logs_the_same_as_generate_xml_body(caplog):
+    event = ALERT_CAP_EVENT | {"description": "Rhybudd llifogydd ŵ"}
+
+    with caplog.at_level(logging.INFO, logger="broadcast"):
+        generate_xml_body(event)
+        write_xml_body(event, io.BytesIO())
+
+    generated, written = caplog.records
+    assert (generated.body_bytes, generated.body_sha256) == (written.body_bytes, written.body_sha256)
+
+
+def test_write_polygon_writes_pairs_in_chunks(mocker):
+    mocker.patch("emergency_alerts_utils.xml.common.POLYGON_CHUNK_SIZE", 2)
+    writes = []
+
+    class Output:
+        def write(self, data):
+            writes.append(data)
+
+    with etree.xmlfile(Output(), encoding="utf-8", buffered=False) as xf:
+        write_polygon(xf, "polygon", iter([[1, 2], [3, 4.5], [5, 6], [1, 2]]))
+
+    assert b"".join(writes) == b"<polygon>1,2 3,4.5 5,6 1,2</polygon>"
+    assert b"1,2 3,4.5" in writes
+    assert b" 5,6 1,2" in writes
+
+
+@pytest.mark.parametrize("event", [ALERT_CAP_EVENT, CANCEL_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_IBAG_EVENT])
+def test_verify_signature_returns_signed_xml(event, signing_key_and_certificate):
+    key, cert = signing_key_and_certificate
+    body = generate_xml_body(event, signing_enabled=True, signing_key=key, signing_certificate=cert)
+
+    signed_xml = verify_signature(body, cert)
+
+    identifier = signed_xml.findtext("{*}identifier") or signed_xml.findtext(".//{*}IBAG_cap_identifier")
+    assert identifier == event["identifier"]
+    assert signed_xml.find(".//{http://www.w3.org/2000/09/xmldsig#}Signature") is None
+
+
+def test_verify_signature_raises_if_document_has_changed(signing_key_and_certificate):
+    key, cert = signing_key_and_certificate
+    body = generate_xml_body(ALERT_CAP_EVENT, signing_enabled=True, signing_key=key, signing_certificate=cert)
+
+    with pytest.raises(InvalidDigest):
+        verify_signature(body.replace("my-headline", "another-headline"), cert)
+
+
+def test_verify_signature_raises_for_a_different_certificate(signing_key_and_certificate):
+    key, cert = signing_key_and_certificate
+    other_cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    body = generate_xml_body(ALERT_CAP_EVENT, signing_enabled=True, signing_key=key, signing_certificate=cert)
+
+    with pytest.raises(InvalidSignature):
+        verify_signature(body, other_cert)
+
+
+def test_verify_signature_raises_for_expired_certificate(certificate_authority):
+    ca_key, ca_certificate, _ = certificate_authority
+    expired_cert = certificate_to_pem(
+        make_certificate("signer.example", ca_key, ca_key, ca_certificate, valid_for=datetime.timedelta(minutes=1))
+    )
+    body = etree.tostring(
+        digitally_sign(etree.fromstring("<Test>Some Value</Test>"), key=key_to_pem(ca_key), cert=expired_cert)
+    )
+
+    with pytest.raises(InvalidCertificate):
+        verify_signature(body, expired_cert)
+
+
+def test_document_verifier_checks_chain_to_ca(certificate_authority, signing_key_and_certificate):
+    _, _, ca_pem_file = certificate_authority
+    key, cert = signing_key_and_certificate
+    example_key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    example_cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    verifier = DocumentVerifier(ca_pem_file=ca_pem_file)
+
+    verifier.verify(digitally_sign(etree.fromstring("<Test>Some Value</Test>"), key=key, cert=cert))
+
+    with pytest.raises(InvalidCertificate):
+        verifier.verify(digitally_sign(etree.fromstring("<Test>Some Value</Test>"), key=example_key, cert=example_cert))
+
+
+def test_get_verifier_reuses_verifier_for_the_same_certificate(signing_key_and_certificate):
+    _, cert = signing_key_and_certificate
+
+    assert get_verifier(cert) is get_verifier(cert)
+
+
+@pytest.mark.parametrize("use_executor", [False, True])
+def test_verify_all_verifies_each_document(signing_key_and_certificate, use_executor):
+    key, cert = signing_key_and_certificate
+    documents = [
+        generate_xml_body(event, signing_enabled=True, signing_key=key, signing_certificate=cert)
+        for event in (ALERT_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_CAP_EVENT)
+    ]
+    documents[1] = documents[1].replace("my-headline", "another-headline").replace("newlines", "new lines")
+    documents.append("<Test")
+
+    if use_executor:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = DocumentVerifier(cert).verify_all(documents, executor=executor)
+    else:
+        results = DocumentVerifier(cert).verify_all(documents, max_workers=2)
+
+    assert [type(result.error) for result in results] == [type(None), InvalidDigest, type(None), etree.XMLSyntaxError]
+    assert results[0].verify_result.signed_xml.findtext("{*}identifier") == ALERT_CAP_EVENT["identifier"]
+    assert results[1].verify_result is None
+    assert all(result.seconds > 0 for result in results)
+
+
 def assert_valid_cap_xml(cap_alert_xml):
     cap_alert_xml = etree.tostring(cap_alert_xml)
     cap12_path = os.path.join(
@@ -1,4 +1,5 @@
 import datetime
+import io
 import os
 import uuid
 
@@ -11,7 +12,9 @@ from emergency_alerts_utils.xml.cap import (
     generate_cap_alert,
     generate_cap_cancel_message,
     generate_cap_link_test,
+    write_cap_alert,
 )
+from emergency_alerts_utils.xml.common import convert_etree_to_string
 from tests.xml.utils import (  # noqa: F401 - events are eval-ed by tests
     ALERT_CAP_EVENT,
     CANCEL_CAP_EVENT,
@@ -347,3 +350,62 @@ def test_generate_xml_body_doesnt_canonicalize():
     path = "/cap:alert/cap:info/cap:description//text()"
     description = etree.fromstring(body).xpath(path, namespaces={"cap": "urn:oasis:names:tc:emergency:cap:1.2"})[0]
     assert description == "  description\nwith\nnewlines"
+
+
+def test_cap_alerts_dont_share_elements():
+    def generate(identifier, web=None):
+        return generate_cap_alert(
+            identifier=identifier,
+            headline="headline",
+            description=f"description of {identifier}",
+            areas=[{"polygon": [[1, 2], [3, 4], [5, 6], [1, 2]]}],
+            sent="2020-01-01T00:00:00-00:00",
+            expires="2020-01-01T01:00:00-00:00",
+            language="en-GB",
+            channel="severe",
+            web=web,
+        )
+
+    first = generate("first", web="https://www.gov.uk/alerts")
+    first_xml = etree.tostring(first)
+    second = generate("second")
+
+    assert etree.tostring(first) == first_xml
+    assert b"first" not in etree.tostring(second)
+    assert b"https://www.gov.uk/alerts" not in etree.tostring(second)
+    assert len(second.findall(".//area")) == 1
+    assert etree.tostring(second) == etree.tostring(generate("second"))
+
+
+@pytest.mark.parametrize(
+    "areas",
+    [
+        [],
+        [{"polygon": [[1, 2], [3, 4], [5, 6], [1, 2]]}],
+        [
+            {
+                "polygons": [[[1, 2], [3, 4], [1, 2]], [[51.0 + i / 1000, -1.5] for i in range(250)]],
+                "description": "<a&b>",
+            },
+            {"polygon": []},
+        ],
+    ],
+)
+@pytest.mark.parametrize("web", [None, "https://www.gov.uk/alerts"])
+def test_write_cap_alert_writes_the_same_as_generate_cap_alert(areas, web):
+    kwargs = {
+        "identifier": "identifier",
+        "headline": "headline",
+        "description": "Ŵelsh <b>&amp;</b>\n🇬🇧",
+        "areas": areas,
+        "sent": "2020-01-01T00:00:00-00:00",
+        "expires": "2020-01-01T01:00:00-00:00",
+        "language": "cy-GB",
+        "channel": "severe",
+        "web": web,
+    }
+    output = io.BytesIO()
+
+    write_cap_alert(output, **kwargs)
+
+    assert output.getvalue() == convert_etree_to_string(generate_cap_alert(**kwargs)).encode("utf-8")
@@ -1,4 +1,5 @@
 import datetime
+import io
 import os
 import uuid
 
@@ -7,11 +8,12 @@ import pytest
 from lxml import etree
 
 from emergency_alerts_utils.xml.broadcast import generate_xml_body
-from emergency_alerts_utils.xml.common import SENDER
+from emergency_alerts_utils.xml.common import SENDER, convert_etree_to_string
 from emergency_alerts_utils.xml.ibag import (
     generate_ibag_alert,
     generate_ibag_cancel_message,
     generate_ibag_link_test,
+    write_ibag_alert,
 )
 from tests.xml.utils import ALERT_IBAG_EVENT, xml_path
 
@@ -413,3 +415,55 @@ def test_signed_ibag_message_is_valid(mocker):
         signing_certificate=cert,
     )
     assert_valid_ibag_xml(etree.fromstring(xml_root))
+
+
+def test_ibag_alerts_dont_share_elements():
+    def generate(identifier, areas):
+        return generate_ibag_alert(
+            message_number="00000001",
+            identifier=identifier,
+            headline="headline",
+            description=f"description of {identifier}",
+            areas=areas,
+            sent="2020-01-01T00:00:00-00:00",
+            expires="2020-01-01T01:00:00-00:00",
+            language="English",
+            channel="severe",
+        )
+
+    first = generate("first", [{"polygon": [[1, 2], [3, 4], [5, 6], [1, 2]]}] * 2)
+    first_xml = etree.tostring(first)
+    second = generate("second", [])
+
+    assert etree.tostring(first) == first_xml
+    assert b"first" not in etree.tostring(second)
+    assert len(first.findall(".//IBAG_Alert_Area")) == 2
+    assert second.findall(".//IBAG_Alert_Area") == []
+    assert etree.tostring(second) == etree.tostring(generate("second", []))
+
+
+@pytest.mark.parametrize(
+    "areas",
+    [
+        [],
+        [{"polygon": [[1, 2], [3, 4], [5, 6], [1, 2]]}],
+        [{"polygon": [[51.0 + i / 1000, -1.5] for i in range(250)], "geocodes": ["a", ""]}, {"geocodes": ["b"]}],
+    ],
+)
+def test_write_ibag_alert_writes_the_same_as_generate_ibag_alert(areas):
+    kwargs = {
+        "message_number": "00000001",
+        "identifier": "identifier",
+        "headline": "headline",
+        "description": "Ŵelsh <b>&amp;</b>\n🇬🇧",
+        "areas": areas,
+        "sent": "2020-01-01T00:00:00-00:00",
+        "expires": "2020-01-01T01:00:00-00:00",
+        "language": "Welsh",
+        "channel": "operator",
+    }
+    output = io.BytesIO()
+
+    write_ibag_alert(output, **kwargs)
+
+    assert output.getvalue() == convert_etree_to_string(generate_ibag_alert(**kwargs)).encode("utf-8")
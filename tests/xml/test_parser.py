@@ -0,0 +1,222 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from emergency_alerts_utils.xml.broadcast import generate_xml_body
+from emergency_alerts_utils.xml.parser import (
+    InvalidBroadcastXMLError,
+    iterparse_xml_body,
+    parse_cap_references,
+    parse_polygon,
+    parse_xml_body,
+)
+from tests.xml.utils import (
+    ALERT_CAP_EVENT,
+    ALERT_IBAG_EVENT,
+    CANCEL_CAP_EVENT,
+    CANCEL_IBAG_EVENT,
+    LINK_TEST_CAP_EVENT,
+    LINK_TEST_IBAG_EVENT,
+)
+
+
+def parse_both_ways(body):
+    event = parse_xml_body(body)
+    assert iterparse_xml_body(io.BytesIO(body.encode("utf-8"))) == event
+    return event
+
+
+@pytest.mark.parametrize("event", [ALERT_CAP_EVENT, CANCEL_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_IBAG_EVENT])
+@pytest.mark.parametrize("signing_enabled", [False, True])
+def test_parsed_event_generates_the_same_body(event, signing_enabled):
+    key = open(os.path.join(os.path.dirname(__file__), "example.key")).read()
+    cert = open(os.path.join(os.path.dirname(__file__), "example.pem")).read()
+    body = generate_xml_body(event, signing_enabled=signing_enabled, signing_key=key, signing_certificate=cert)
+
+    parsed = parse_both_ways(body)
+
+    assert generate_xml_body(parsed, signing_enabled=signing_enabled, signing_key=key, signing_certificate=cert) == body
+
+
+def test_parse_cap_alert():
+    event = ALERT_CAP_EVENT | {
+        "areas": [
+            {
+                "polygons": [[[51.12, -1.2], [51.12, 1.2], [51.12, -1.2]], [[1, 2], [3, 4], [1, 2]]],
+                "description": "A&B",
+            },
+        ],
+        "web": "https://www.gov.uk/alerts",
+    }
+
+    assert parse_both_ways(generate_xml_body(event)) == {
+        "identifier": ALERT_CAP_EVENT["identifier"],
+        "message_format": "cap",
+        "message_type": "alert",
+        "sender": "broadcasts@notifications.service.gov.uk",
+        "sent": "2020-01-01T00:00:00-00:00",
+        "expires": "2020-01-01T00:00:00-00:00",
+        "language": "English",
+        "channel": "severe",
+        "sender_name": "GOV.UK Emergency Alerts",
+        "headline": "my-headline",
+        "description": "  description\nwith\nnewlines",
+        "web": "https://www.gov.uk/alerts",
+        "areas": [
+            {
+                "description": "A&B",
+                "polygons": [[[51.12, -1.2], [51.12, 1.2], [51.12, -1.2]], [[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]]],
+            }
+        ],
+    }
+
+
+def test_parse_ibag_alert():
+    event = ALERT_IBAG_EVENT | {"areas": [{"polygon": [[1, 2], [3, 4], [1, 2]], "geocodes": ["a", "b"]}]}
+
+    assert parse_both_ways(generate_xml_body(event)) == {
+        "identifier": ALERT_IBAG_EVENT["identifier"],
+        "message_format": "ibag",
+        "message_type": "alert",
+        "message_number": "00000074",
+        "sent": "2020-01-01T00:00:00-00:00",
+        "expires": "2020-01-01T00:00:00-00:00",
+        "language": "English",
+        "channel": "severe",
+        "headline": None,
+        "description": "  description\nwith\nnewlines",
+        "areas": [{"description": "area-1", "polygon": [[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]], "geocodes": ["a", "b"]}],
+    }
+
+
+@pytest.mark.parametrize(
+    "channel",
+    ["test", "operator", "severe", "government"],
+)
+@pytest.mark.parametrize("event", [ALERT_CAP_EVENT, ALERT_IBAG_EVENT])
+def test_parse_channel(event, channel):
+    assert parse_both_ways(generate_xml_body(event | {"channel": channel}))["channel"] == channel
+
+
+def test_parse_cancel_messages():
+    cap = parse_both_ways(generate_xml_body(CANCEL_CAP_EVENT))
+    ibag = parse_both_ways(generate_xml_body(CANCEL_IBAG_EVENT))
+
+    assert cap["message_type"] == ibag["message_type"] == "cancel"
+    assert cap["references"] == [
+        {"message_id": reference["message_id"], "sent": reference["sent"]}
+        for reference in CANCEL_CAP_EVENT["references"]
+    ]
+    # IBAG only refers to the last message
+    assert ibag["references"] == [
+        {
+            "message_number": CANCEL_IBAG_EVENT["references"][-1]["message_number"],
+            "message_id": CANCEL_IBAG_EVENT["references"][-1]["message_id"],
+        }
+    ]
+
+
+def test_parse_link_tests():
+    cap = parse_both_ways(generate_xml_body(LINK_TEST_CAP_EVENT))
+    ibag = parse_both_ways(generate_xml_body(LINK_TEST_IBAG_EVENT))
+
+    assert (cap["message_format"], cap["message_type"], cap["identifier"]) == (
+        "cap",
+        "test",
+        LINK_TEST_CAP_EVENT["identifier"],
+    )
+    assert (ibag["message_format"], ibag["message_type"], ibag["identifier"], ibag["message_number"]) == (
+        "ibag",
+        "test",
+        None,
+        LINK_TEST_IBAG_EVENT["message_number"],
+    )
+
+
+@pytest.mark.parametrize("declaration", ['<?xml version="1.0" encoding="UTF-8"?>', '<?xml version="1.0"?>'])
+def test_parse_string_with_xml_declaration(declaration):
+    body = generate_xml_body(ALERT_CAP_EVENT | {"description": "Rhybudd ŵ"})
+
+    assert parse_xml_body(declaration + body) == parse_xml_body(body)
+    assert parse_xml_body(declaration + body)["description"] == "Rhybudd ŵ"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (None, []),
+        ("", []),
+        ("1,2 3.5,-4.25", [[1.0, 2.0], [3.5, -4.25]]),
+        ("  1,2\n3,4  ", [[1.0, 2.0], [3.0, 4.0]]),
+    ],
+)
+def test_parse_polygon(text, expected):
+    assert parse_polygon(text) == expected
+
+
+@pytest.mark.parametrize("text", ["1,2 3", "1,x"])
+def test_parse_polygon_raises_for_bad_polygon(text):
+    with pytest.raises(InvalidBroadcastXMLError):
+        parse_polygon(text)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (None, []),
+        ("sender,id,2020-01-01T00:00:00-00:00", [{"message_id": "id", "sent": "2020-01-01T00:00:00-00:00"}]),
+        (
+            "sender,1,2020-12-08 11:19:44.130585 sender,2,2020-12-09T10:10:42-00:00",
+            [
+                {"message_id": "1", "sent": "2020-12-08 11:19:44.130585"},
+                {"message_id": "2", "sent": "2020-12-09T10:10:42-00:00"},
+            ],
+        ),
+    ],
+)
+def test_parse_cap_references(text, expected):
+    assert parse_cap_references(text) == expected
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        # External entity
+        b'<!DOCTYPE alert [<!ENTITY x SYSTEM "file:///etc/passwd">]>'
+        b'<alert xmlns="urn:oasis:names:tc:emergency:cap:1.2"><identifier>&x;</identifier></alert>',
+        # Entity expansion
+        b'<!DOCTYPE alert [<!ENTITY a "aaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;">]>'
+        b'<alert xmlns="urn:oasis:names:tc:emergency:cap:1.2"><identifier>&b;</identifier></alert>',
+        b"<alert",
+        b"<alert/>",
+        b'<alert xmlns="urn:oasis:names:tc:emergency:cap:1.2"><info><area><polygon>1,x</polygon></area></info></alert>',
+    ],
+)
+def test_parse_rejects_invalid_documents(body):
+    with pytest.raises(InvalidBroadcastXMLError):
+        parse_xml_body(body)
+    with pytest.raises(InvalidBroadcastXMLError):
+        iterparse_xml_body(io.BytesIO(body))
+
+
+def test_parse_xml_body_can_be_used_from_several_threads():
+    bodies = [generate_xml_body(event) for event in (ALERT_CAP_EVENT, ALERT_IBAG_EVENT, CANCEL_CAP_EVENT)] * 10
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        parsed = list(executor.map(parse_xml_body, bodies))
+
+    assert parsed == [parse_xml_body(body) for body in bodies]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '<?xml version="1.0" encoding="UTF-8"?><alert/>',
+        '<?xml version="1.0" encoding="UTF-16"?><alert xmlns="urn:oasis:names:tc:emergency:cap:1.2"/>',
+    ],
+)
+def test_parse_rejects_invalid_strings_with_xml_declaration(body):
+    with pytest.raises(InvalidBroadcastXMLError):
+        parse_xml_body(body)
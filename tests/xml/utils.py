@@ -1,5 +1,10 @@
+import datetime
 import uuid
 
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
 from lxml import etree
 
 LINK_TEST_IBAG_EVENT = {
@@ -118,3 +123,58 @@ def xml_path(alert_xml, path, format="cap"):
         }
 
     return root.xpath(path, namespaces=ns)
+
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def make_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_certificate(common_name, key, issuer_key=None, issuer=None, ca=False, valid_for=ONE_DAY):
+    """
+    Returns a certificate for `key`, signed by `issuer_key` for the certificate `issuer`, or
+    self-signed, which is valid from an hour ago for `valid_for`
+    """
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    not_valid_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer.subject if issuer else name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(not_valid_before)
+        .not_valid_after(not_valid_before + valid_for)
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=not ca,
+                content_commitment=False,
+                key_encipherment=False,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=ca,
+                crl_sign=ca,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=True,
+        )
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key((issuer_key or key).public_key()), critical=False
+        )
+        .sign(issuer_key or key, hashes.SHA256())
+    )
+
+
+def key_to_pem(key):
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def certificate_to_pem(certificate):
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()